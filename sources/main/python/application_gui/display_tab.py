@@ -2,13 +2,37 @@ import PyQt5.QtCore as qtc
 import PyQt5.QtGui as qtg
 import PyQt5.QtWidgets as qtw
 
+import pandas as pd
+from functools import partial
+import itertools
+import logging
+import time
+
 from application_gui.common_gui_functions import _open_window, errorMessage, warningMessage
+from application_gui.table_job import jobTableModel
 from application_gui.window_column_selection import selectColumnsWindow
 from application_gui.window_custom_display import selectCustomDisplayWindow
 
-from get_jobs import getJobList, killJobs
+from get_jobs import diffJobLists, killJobs
+from job_history import saveSnapshot
 from settings import getDisplayList, loadDisplay
-from selection import generateCustomDisplay
+from selection import generateCustomDisplay, loadCustomDisplay
+
+# Counter giving a new version to each job list displayed
+_job_versions = itertools.count()
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# -------------------------------------------------------
+# Report the job lists that could not be saved in the history
+def _log_history_error(server_name, future):
+    if future.cancelled():
+        return 0
+    error = future.exception()
+    if error is not None:
+        logging.getLogger(__name__).warning("The job list of "+server_name+" could not be saved in the history: "+repr(error))
 
 ##-\-\-\-\-\-\-\-\-\-\-\-\-\-\
 ## TAB DISPLAY FOR THE MAIN GUI
@@ -38,10 +62,10 @@ class mainTabWidget(qtw.QTabWidget):
 
     # ------------------------
     # Add a tab to the display
-    def newTab(self, server_class):
+    def newTab(self, server_class, jobs):
 
         # Append the tab to the list
-        self.displayedTabs.append( serverTab(self.parent,server_class) )
+        self.displayedTabs.append( serverTab(self.parent,server_class, jobs=jobs) )
 
         # Append the tab to the widget
         self.addTab( self.displayedTabs[-1].tabWidget, server_class.name )
@@ -86,16 +110,25 @@ class mainTabWidget(qtw.QTabWidget):
 ##-/-/-/-/-/-/
 
 class serverTab:
-    def __init__(self, parent, server):
+    def __init__(self, parent, server, jobs=None):
 
         # Keep the server in memory
         self.parent = parent
         self.server = server
+        self.jobs = jobs
+        self.jobs_version = next(_job_versions)
 
         self.loaded_display= None
 
+        # Keep the full list of columns for the editors
+        self.column_names = []
+        self.example_job = None
+
+        # Filter applied on the server to the current job list
+        self.jobs_filter = None
+
         if self.server is not None:
-            self.refreshJobList()
+            self._keep_full_columns()
 
             # Load the list of custom displays
             self.refreshDisplayList()
@@ -190,15 +223,16 @@ class serverTab:
         use_custom = self.customDisplayCheckBox.isChecked()
         custom_selection = self.customDisplayComboBox.currentText()
 
-        # Remove the previous widget
-        self.jobsTable.deleteLater()
-
         # Retrieve and apply the custom display
         if use_custom and custom_selection != "---" and custom_selection != "":
 
             # Retrieve the custom display instance
-            _display_details = loadDisplay(custom_selection)
-            self.loaded_display = generateCustomDisplay(_display_details)
+            self.loaded_display = loadCustomDisplay(custom_selection)
+
+            # Retrieve the columns and jobs missing from the last refresh
+            if self._missing_columns() or self._missing_jobs():
+                self.parent.refreshTab(self)
+                return 0
 
             # Process a column selection
             if self.loaded_display.display_type == 'column':
@@ -207,16 +241,13 @@ class serverTab:
                 self.selected_columns = self.loaded_display.columns
 
                 # Load the table content
-                self.generateTable(custom_display=False)
+                self.jobInTable(custom_display=False)
 
             # Process a custom selection
             elif 'selection' in self.loaded_display.display_type:
 
-                # Make the job selection
-                if len(self.loaded_display.selection.sorting['columns']) != 0:
-                    self.selected_jobs = self.loaded_display.selection.sortJobs(self.jobs)
-                else:
-                    self.selected_jobs = self.loaded_display.selection.selectJobs(self.jobs)
+                # Make the job selection, or reuse it for the same job list
+                self.selected_jobs = self.loaded_display.selectedJobs(self.jobs, data_version=self.jobs_version)
 
                 # Use a column selection
                 if self.loaded_display.display_type == 'selection_column':
@@ -227,25 +258,141 @@ class serverTab:
                     self.selected_columns = self.jobs.columns
 
                 # Load the table content
-                self.generateTable(custom_display=True)
+                self.jobInTable(custom_display=True)
 
         # Use the basic display
         else:
+            self.loaded_display = None
+
+            # Retrieve the columns and jobs missing from the last refresh
+            if self._missing_columns() or self._missing_jobs():
+                self.parent.refreshTab(self)
+                return 0
+
             self.selected_columns = self.jobs.columns
-            self.generateTable(custom_display=False)
+            self.jobInTable(custom_display=False)
 
-    # --------------------
-    # Refresh the job list
-    def refreshJobList(self):
-        self.jobs = getJobList(self.server, command=self.server.get_jobs, username=self.server.queryname)
+    # ----------------------------------------------
+    # Get the columns to retrieve for the display
+    def requiredColumns(self):
+
+        # Get all the columns for the basic display
+        if self.loaded_display is None or self.loaded_display.display_type == 'selection':
+            return None
+
+        # Get the columns to display
+        columns = list(self.loaded_display.columns)
+
+        # Add the column to read the paths from
+        if self.loaded_display.selection is not None:
+            columns.append( self.loaded_display.selection.column )
+
+        # Add the column to kill the jobs
+        columns.append( self.server.kill_col )
+
+        # Add the columns used to follow the activity of the queue, if the server has them
+        columns += [x for x in ['JOBID', 'STATE', 'TIME_LEFT'] if x in self.column_names]
+
+        return columns
+
+    # ------------------------------------------------------
+    # Get the filter to apply on the server for the display
+    def requiredFilter(self):
+
+        # Only the selections can be filtered on the server
+        if self.loaded_display is None or self.loaded_display.selection is None:
+            return None
+
+        return self.loaded_display.selection.remoteFilter()
+
+    # --------------------------------------------
+    # Display the job list retrieved from the server
+    def setJobList(self, job_df, remote_filter=None):
+
+        # Keep the complete job lists in the history
+        if remote_filter is None:
+            self._save_history(job_df)
+
+        # Only apply the changes to a plain table
+        if self._is_plain_table() and list(job_df.columns) == list(self.jobs.columns) and remote_filter == self.jobs_filter:
+            try:
+                inserted, deleted, updated = diffJobLists(self.jobs, job_df, key_column='JOBID')
+            except (KeyError, ValueError):
+                pass
+            else:
+                self.updateTable(job_df, inserted, deleted, updated)
+                self._keep_full_columns()
+                return 0
+
+        # Rebuild the whole table
+        self.jobs = job_df
+        self.jobs_version = next(_job_versions)
+        self.jobs_filter = remote_filter
+        self._keep_full_columns()
+        self.selectDisplayType()
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ------------------------------------------------
+    # Save the job list in the history in the background
+    def _save_history(self, job_df):
+        future = self.parent.refresh_engine.submit(saveSnapshot, self.server.name, job_df, key_column='JOBID', timestamp=time.time())
+        future.add_done_callback( partial(_log_history_error, self.server.name) )
+
+    # ------------------------------------------
+    # Check if the table shows one job per row
+    def _is_plain_table(self):
+        return self.loaded_display is None or self.loaded_display.display_type == 'column'
+
+    # ------------------------------------------------
+    # Save the columns of a job list with all of them
+    def _keep_full_columns(self):
+
+        # Ignore the job lists limited to the displayed columns
+        if not set(self.column_names).issubset(self.jobs.columns):
+            return 0
+
+        # Save the columns and an example of job
+        self.column_names = list(self.jobs.columns)
+        if len(self.jobs) > 0:
+            self.example_job = self.jobs.iloc[0]
+
+    # ----------------------------------------------------
+    # Check if the display needs columns not retrieved yet
+    def _missing_columns(self):
+
+        # Get the required columns
+        columns = self.requiredColumns()
+        if columns is None:
+            columns = self.column_names
+
+        # Check the current job list, unless it has all the columns already
+        if set(self.column_names).issubset(self.jobs.columns):
+            return False
+
+        return not set(columns).issubset(self.jobs.columns)
+
+    # -------------------------------------------------------
+    # Check if the display needs jobs filtered out on the server
+    def _missing_jobs(self):
+        return self.jobs_filter is not None and self.jobs_filter != self.requiredFilter()
 
     # ----------------------
     # Generate the job table
     def generateTable(self, custom_display=False):
 
+        # Color the background of the section headers
+        if self.parent.config['USER']['dark_theme'] == 'True':
+            bcg_color = qtg.QColor(100,130,147)
+        else:
+            bcg_color = qtg.QColor(245,245,245)
+
         # Table for the results
-        self.jobsTable = qtw.QTableWidget(0, len( self.selected_columns ))
-        self.jobsTable.setHorizontalHeaderLabels( self.selected_columns )
+        self.jobsTable = qtw.QTableView()
+        self.jobsModel = jobTableModel(self.jobsTable, header_color=bcg_color)
+        self.jobsTable.setModel(self.jobsModel)
         self.jobsTable.setSelectionBehavior(qtw.QAbstractItemView.SelectRows)
         self.jobsTable.setEditTriggers(qtw.QAbstractItemView.NoEditTriggers)
 
@@ -260,100 +407,49 @@ class serverTab:
         if self.server is not None:
             self.jobInTable(custom_display=custom_display)
 
-        # Resize the columns
-        header = self.jobsTable.horizontalHeader()
-        for i in range(len( self.selected_columns )):
-            header.setSectionResizeMode(i, qtw.QHeaderView.ResizeToContents)
+    # -------------------------------------------
+    # Apply the changes in the job list to the table
+    def updateTable(self, job_df, inserted, deleted, updated):
+
+        # Get the rows of the deleted jobs
+        old_keys = list( self.jobs['JOBID'].astype(str) )
+        deleted = set(deleted)
+        deleted_rows = [i for i, x in enumerate(old_keys) if x in deleted]
+
+        # Keep the jobs in the order of the table, new jobs at the end
+        table_keys = [x for x in old_keys if x not in deleted] + inserted
+        new_keys = pd.Index( job_df['JOBID'].astype(str) )
+        self.jobs = job_df.iloc[ new_keys.get_indexer(table_keys) ].reset_index(drop=True)
+        self.jobs_version = next(_job_versions)
+
+        # Get the rows of the updated jobs
+        row_ids = {x:i for i, x in enumerate(table_keys)}
+        updated_rows = [row_ids[x] for x in updated]
+
+        # Update the table
+        self.jobsModel.updateJobs(self.jobs, deleted_rows, updated_rows)
 
     # -------------------------
     # Add the jobs to the table
     def jobInTable(self, custom_display=False):
 
-        # Delete the values
-        rowCount = self.jobsTable.rowCount()
-        if rowCount > 0:
-            for i in range(rowCount):
-                self.jobsTable.removeRow(0)
-
         # Custom display
         if custom_display:
-            self.addCustomTableContent(self.selected_jobs, current_id=0)
-
-        # Normal display
-        else:
-
-            # Fill the table
-            if len(self.jobs) > 0:
-                for i, row in self.jobs.iterrows():
-
-                    # Fill the rows
-                    self.jobsTable.insertRow(i)
-
-                    # Fill the columns
-                    j = 0
-                    for data, column_name in zip(row, row.index):
-                        if column_name in self.selected_columns:
-                            item = qtw.QTableWidgetItem(str(data))
-                            self.jobsTable.setItem(i, j, item)
-                            j += 1
+            self.jobsModel.setJobs(self.jobs, self.selected_columns, job_list=self.selected_jobs, section_names=self.loaded_display.selection.sorting['names'])
 
-    # ------------------------------
-    # Add a custom selection of jobs
-    def addCustomTableContent(self, job_list, pre_symbol='', current_id=0, name_id=0):
-
-        # Process a dictionary
-        if isinstance(job_list, dict):
-
-            # Set the font
-            boldFont = qtg.QFont()
-            boldFont.setBold(True)
-
-            # Process all sections
-            for section_name in job_list.keys():
-
-                # Fill the rows
-                self.jobsTable.insertRow(current_id)
-
-                # Add the header
-                section_type = self.loaded_display.selection.sorting['names'][name_id]
-                headerText = pre_symbol + ' ' + section_type + ': ' + section_name.capitalize()
-                item = qtw.QTableWidgetItem(headerText)
-                self.jobsTable.setSpan(current_id, 0, 1, len( self.selected_columns ))
-                self.jobsTable.setItem(current_id, 0, item)
-                self.jobsTable.item(current_id,0).setFont(boldFont)
-
-                # Color the background of the cell
-                if self.parent.config['USER']['dark_theme'] == 'True':
-                    bcg_color = qtg.QColor(100,130,147)
-                else:
-                    bcg_color = qtg.QColor(245,245,245)
-
-                self.jobsTable.item(current_id,0).setBackground(bcg_color)
-
-                current_id += 1
-
-                # Process the content of the dictionary element
-                current_id = self.addCustomTableContent(job_list[section_name], pre_symbol=pre_symbol+'>', current_id=current_id, name_id=name_id+1)
-
-        # Fill the table
+        # Normal display
         else:
-            if len(job_list) > 0:
-                for i, row in job_list.iterrows():
-
-                    # Fill the rows
-                    self.jobsTable.insertRow(current_id)
-
-                    # Fill the columns
-                    j = 0
-                    for data, column_name in zip(row, row.index):
-                        if column_name in self.selected_columns:
-                            item = qtw.QTableWidgetItem(str(data))
-                            self.jobsTable.setItem(current_id, j, item)
-                            j += 1
+            self.jobsModel.setJobs(self.jobs, self.selected_columns)
 
-                    current_id += 1
+        # Display the section headers over the whole table
+        self.jobsTable.clearSpans()
+        for row_id in self.jobsModel.sectionRows():
+            self.jobsTable.setSpan(row_id, 0, 1, len( self.selected_columns ))
 
-        return current_id
+        # Resize the columns
+        header = self.jobsTable.horizontalHeader()
+        for i in range(len( self.selected_columns )):
+            header.setSectionResizeMode(i, qtw.QHeaderView.ResizeToContents)
 
     ##-\-\-\-\-\-\-\-\
     ## CONTEXTUAL MENU
@@ -402,23 +498,26 @@ class serverTab:
 
         else:
             # Get the job ID to kill
-            job_id = self.jobs[ self.server.kill_col ].loc[row_id]
+            job_position = self.jobsModel.jobPosition(row_id)
+            if job_position is None:
+                return 0
+            job_id = self.jobs[ self.server.kill_col ].iloc[job_position]
 
             # Ask for the confirmation
-            if warningMessage("Delete Job", "Are you sure you want to delete the job "+job_id+"? This operation cannot be cancelled."):
-                killJobs(self.server, job_id, command=self.server.kill_jobs)
+            if warningMessage("Delete Job", "Are you sure you want to delete the job "+str(job_id)+"? This operation cannot be cancelled."):
+                self.parent.network_worker.run(killJobs, self.server, job_id, command=self.server.kill_jobs, failed=partial(self.parent.networkError, self.server.name))
 
     # --------------------
     # New column selection
     def selectColumnsDisplay(self):
-        _open_window(self.parent, selectColumnsWindow, 'column_selection', column_names=self.jobs.columns)
+        _open_window(self.parent, selectColumnsWindow, 'column_selection', column_names=self.column_names)
 
     # ---------------------
     # Edit column selection
     def editColumnsDisplay(self, row_id=0):
 
         # Get the job to use as ref
-        job_content = self.jobs.loc[row_id]
+        job_content = self.example_job
 
         # Load the current selection
         display_name = self.customDisplayComboBox.currentText()
@@ -427,14 +526,14 @@ class serverTab:
 
         # Load a column selection
         if selected_display.display_type == 'column':
-            _open_window(self.parent, selectColumnsWindow, 'column_selection', column_names=self.jobs.columns, loaded_display=selected_display)
+            _open_window(self.parent, selectColumnsWindow, 'column_selection', column_names=self.column_names, loaded_display=selected_display)
 
         else:
-            _open_window(self.parent, selectCustomDisplayWindow, 'custom_display', column_names=self.jobs.columns, example_job=job_content, loaded_display=selected_display)
+            _open_window(self.parent, selectCustomDisplayWindow, 'custom_display', column_names=self.column_names, example_job=job_content, loaded_display=selected_display)
 
     # ----------------------
     # New custom job display
     def createCostumDisplay(self, row_id=0):
 
         # Open the custom display creation window
-        _open_window(self.parent, selectCustomDisplayWindow, 'custom_display', column_names=self.jobs.columns, example_job=job_content)
+        _open_window(self.parent, selectCustomDisplayWindow, 'custom_display', column_names=self.column_names, example_job=self.example_job)
@@ -163,7 +163,7 @@ class menuBar:
 
             # Select the current tab and retrieve the job list
             _current_tab_id = self.parent.serverTabDisplay.currentIndex()
-            column_names = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].jobs.columns
+            column_names = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].column_names
 
             # Open the new selection option
             _open_window(self.parent, selectColumnsWindow, 'column_selection', column_names=column_names)
@@ -177,8 +177,8 @@ class menuBar:
 
             # Select the current tab and retrieve the job list
             _current_tab_id = self.parent.serverTabDisplay.currentIndex()
-            job_content = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].jobs.loc[0]
-            column_names = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].jobs.columns
+            job_content = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].example_job
+            column_names = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].column_names
 
             # Open the new selection option
             _open_window(self.parent, selectCustomDisplayWindow, 'custom_display', column_names=column_names, example_job=job_content)
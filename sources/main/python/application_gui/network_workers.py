@@ -0,0 +1,91 @@
+import PyQt5.QtCore as qtc
+
+from functools import partial
+
+##-\-\-\-\-\-\-\-\-\-\-\-\-\
+## WORKER FOR NETWORK QUERIES
+##-/-/-/-/-/-/-/-/-/-/-/-/-/
+
+class NetworkWorker(qtc.QObject):
+
+    # Set the signals
+    done = qtc.pyqtSignal(object, object)
+
+    # Initialise
+    def __init__(self, engine, parent=None):
+        super(NetworkWorker, self).__init__(parent)
+
+        # Keep the pool of workers in memory
+        self.engine = engine
+
+        # Receive the results in the GUI thread
+        self.done.connect(self._call)
+
+    # ----------------------------------------
+    # Run the function in a background worker
+    def run(self, function, *args, finished=None, failed=None, **kwargs):
+
+        """ Run a function in a background worker and send the result back to the GUI thread.
+        Argument(s):
+            - function { function } - Function to run in the background.
+            - args { multiple objects } - Arguments of the function.
+            - finished { function } - (Opt.) Function to call in the GUI thread with the result.
+                                      Default is None.
+            - failed { function } - (Opt.) Function to call in the GUI thread with the error raised.
+                                    Default is None.
+            - kwargs { multiple objects } - Keyword arguments of the function.
+        Output(s):
+            - future { Future class } - Future of the function in the pool of workers.
+        """
+
+        # Submit the function to the pool
+        future = self.engine.submit(function, *args, **kwargs)
+
+        return self.watch(future, finished=finished, failed=failed)
+
+    # ------------------------------------------
+    # Send the result of a future when it is done
+    def watch(self, future, finished=None, failed=None):
+
+        """ Send the result of a future submitted to the pool of workers back to the GUI thread.
+        Argument(s):
+            - future { Future class } - Future of the function in the pool of workers.
+            - finished { function } - (Opt.) Function to call in the GUI thread with the result.
+                                      Default is None.
+            - failed { function } - (Opt.) Function to call in the GUI thread with the error raised.
+                                    Default is None.
+        Output(s):
+            - future { Future class } - Future of the function in the pool of workers.
+        """
+
+        # Send the result when the function is done
+        future.add_done_callback( partial(self._send, finished, failed) )
+
+        return future
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # -------------------------------------------
+    # Send the result from the background worker
+    def _send(self, finished, failed, future):
+
+        # Ignore the cancelled functions
+        if future.cancelled():
+            return
+
+        # Send the error
+        error = future.exception()
+        if error is not None:
+            self.done.emit(failed, error)
+
+        # Send the result
+        else:
+            self.done.emit(finished, future.result())
+
+    # -----------------------------------------
+    # Call the function with the result received
+    def _call(self, callback, result):
+        if callback is not None:
+            callback(result)
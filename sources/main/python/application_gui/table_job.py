@@ -2,6 +2,239 @@ import PyQt5.QtCore as qtc
 import PyQt5.QtGui as qtg
 import PyQt5.QtWidgets as qtw
 
+import numpy as np
+import pandas as pd
+
+# Roles of the cells filled by the model
+_USED_ROLES = (qtc.Qt.DisplayRole, qtc.Qt.FontRole, qtc.Qt.BackgroundRole)
+
 ##-\-\-\-\-\-\-\-\-\-\-\-\-\-\-\
 ## TABLE DISPLAY FOR LISTING JOBS
 ##-/-/-/-/-/-/-/-/-/-/-/-/-/-/-/
+
+class jobTableModel(qtc.QAbstractTableModel):
+    def __init__(self, parent=None, header_color=None):
+        super(jobTableModel, self).__init__(parent)
+
+        # Initialise the content of the table
+        self.columns = []
+        self.values = []
+        self.rows = []
+
+        # Set the style of the section headers
+        self.header_color = header_color
+        self.header_font = qtg.QFont()
+        self.header_font.setBold(True)
+
+    ##-\-\-\-\-\-\-\-\-\-\
+    ## READ THE CONTENT
+    ##-/-/-/-/-/-/-/-/-/-/
+
+    # --------------------------
+    # Get the number of rows
+    def rowCount(self, parent=qtc.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    # --------------------------
+    # Get the number of columns
+    def columnCount(self, parent=qtc.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    # ------------------------------------
+    # Read the content of a cell on demand
+    def data(self, index, role=qtc.Qt.DisplayRole):
+
+        # Check the cell, and ignore the roles that are never used
+        if not index.isValid() or role not in _USED_ROLES:
+            return None
+        row = self.rows[index.row()]
+
+        # Display a section header
+        if isinstance(row, str):
+            if role == qtc.Qt.DisplayRole and index.column() == 0:
+                return row
+            elif role == qtc.Qt.FontRole:
+                return self.header_font
+            elif role == qtc.Qt.BackgroundRole and self.header_color is not None:
+                return qtg.QBrush(self.header_color)
+            return None
+
+        # Display the value of the job, like squeue
+        if role == qtc.Qt.DisplayRole:
+            values = self.values[index.column()]
+            return 'N/A' if values is None else _display_value(values[row])
+
+        return None
+
+    # ---------------------------
+    # Get the names of the columns
+    def headerData(self, section, orientation, role=qtc.Qt.DisplayRole):
+        if orientation == qtc.Qt.Horizontal and role == qtc.Qt.DisplayRole:
+            return str(self.columns[section])
+        return super(jobTableModel, self).headerData(section, orientation, role)
+
+    # ------------------------------------------------
+    # Get the position of the job in the table of jobs
+    def jobPosition(self, row_id):
+
+        """ Get the position of the job of a row in the job table.
+        Argument(s):
+            - row_id { int } - Index of the row in the model.
+        Output(s):
+            - position { int } - Position of the job in the job table, None if the row is a section header or does not exist.
+        """
+
+        # Check the row
+        if row_id < 0 or row_id >= len(self.rows) or isinstance(self.rows[row_id], str):
+            return None
+
+        return self.rows[row_id]
+
+    # ------------------------------------
+    # Get the rows used as section headers
+    def sectionRows(self):
+        return [i for i, row in enumerate(self.rows) if isinstance(row, str)]
+
+    ##-\-\-\-\-\-\-\-\-\-\
+    ## EDIT THE CONTENT
+    ##-/-/-/-/-/-/-/-/-/-/
+
+    # ---------------------------
+    # Display a new list of jobs
+    def setJobs(self, job_df, columns, job_list=None, section_names=None):
+
+        """ Replace the content of the table.
+        Argument(s):
+            - job_df { pandas DataFrame } - Table with all the jobs and their properties.
+            - columns { list of str } - Names of the columns to display.
+            - job_list { pandas DataFrame     - (Opt.) Selection of jobs from job_df to display, as returned by the Selection class.
+                         or dict }              Default is None (all the jobs in job_df).
+            - section_names { list of str } - (Opt.) Names of the levels of sections, if job_list is a dictionary.
+                                              Default is None.
+        """
+
+        self.beginResetModel()
+
+        # Keep the columns of the jobs
+        self.columns = list(columns)
+        self.values = _column_values(job_df, self.columns)
+
+        # Get the rows to display
+        if job_list is None:
+            self.rows = list(range(len(job_df)))
+        else:
+            self.rows = []
+            self._add_rows(job_df, job_list, section_names)
+
+        self.endResetModel()
+
+    # --------------------------------------
+    # Apply the changes in the list of jobs
+    def updateJobs(self, job_df, deleted_rows, updated_rows):
+
+        """ Apply the changes of a plain list of jobs.
+        Argument(s):
+            - job_df { pandas DataFrame } - New table of the jobs, with the remaining jobs in the same order as the rows of the table, followed by the new jobs.
+            - deleted_rows { list of int } - Indices of the rows to remove.
+            - updated_rows { list of int } - Indices of the rows to update, after the removal.
+        """
+
+        # Remove the deleted jobs, by blocks from the bottom
+        for first_row, last_row in _group_rows(deleted_rows):
+            self.beginRemoveRows(qtc.QModelIndex(), first_row, last_row)
+            del self.rows[first_row:last_row+1]
+            self.endRemoveRows()
+
+        # Read the remaining jobs from the new table
+        n_kept = len(self.rows)
+        self.values = _column_values(job_df, self.columns)
+        self.rows = list(range(n_kept))
+
+        # Add the new jobs at the end
+        if len(job_df) > n_kept:
+            self.beginInsertRows(qtc.QModelIndex(), n_kept, len(job_df)-1)
+            self.rows = list(range(len(job_df)))
+            self.endInsertRows()
+
+        # Refresh the updated jobs
+        for first_row, last_row in _group_rows(updated_rows):
+            self.dataChanged.emit(self.index(first_row, 0), self.index(last_row, len(self.columns)-1))
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # --------------------------------------------
+    # Add the sections and jobs of a job selection
+    def _add_rows(self, job_df, job_list, section_names, pre_symbol='', name_id=0):
+
+        # Process a dictionary
+        if isinstance(job_list, dict):
+            for section_name in job_list.keys():
+
+                # Add the header
+                self.rows.append( pre_symbol + ' ' + section_names[name_id] + ': ' + section_name.capitalize() )
+
+                # Process the content of the dictionary element
+                self._add_rows(job_df, job_list[section_name], section_names, pre_symbol=pre_symbol+'>', name_id=name_id+1)
+
+        # Add the jobs
+        else:
+            self.rows += list( job_df.index.get_indexer(job_list.index) )
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ----------------------------------------------------------------
+# Get the raw values of the columns, None for the missing columns
+def _column_values(job_df, columns):
+
+    all_values = []
+    for column_name in columns:
+        if column_name not in job_df.columns:
+            all_values.append(None)
+
+        # Keep the integers with missing values as they are, instead of floats
+        elif pd.api.types.is_extension_array_dtype(job_df[column_name]):
+            all_values.append( job_df[column_name].to_numpy(dtype=object) )
+        else:
+            all_values.append( job_df[column_name].to_numpy() )
+
+    return all_values
+
+# ------------------------------------------
+# Get the text of a value as squeue prints it
+def _display_value(value):
+
+    # Show the missing values like squeue
+    if pd.isna(value):
+        return 'N/A'
+
+    # Show the dates in the format of squeue
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime('%Y-%m-%dT%H:%M:%S')
+
+    return str(value)
+
+# ------------------------------------------------
+# Group the rows in blocks, from the bottom first
+def _group_rows(row_ids):
+
+    # Process the rows from the bottom
+    blocks = []
+    for row_id in sorted(row_ids, reverse=True):
+
+        # Extend the current block
+        if len(blocks) != 0 and blocks[-1][0] == row_id + 1:
+            blocks[-1][0] = row_id
+
+        # Start a new block
+        else:
+            blocks.append( [row_id, row_id] )
+
+    return blocks
@@ -265,7 +265,7 @@ class selectCustomDisplayWindow(qtw.QMainWindow):
 
             # Split the content
             try:
-                content_list = content.split(_separator)
+                content_list = splitPath(content, use_path=False, separator=_separator)
             except:
                 content_list = []
 
@@ -2,18 +2,22 @@ import PyQt5.QtCore as qtc
 import PyQt5.QtGui as qtg
 import PyQt5.QtWidgets as qtw
 
-import time
+from functools import partial
 
 from application_gui.app_styles import applyStyle
 from application_gui.common_gui_functions import _open_window, CLabel, choice2Message, errorMessage
 from application_gui.display_tab import mainTabWidget
 from application_gui.menubar import menuBar
+from application_gui.network_workers import NetworkWorker
 from application_gui.window_progressbar import progressBarWindow
 from application_gui.window_user import userSettingsWindow
 from application_gui.window_server_settings import serverSettingsWindow
 
+from get_jobs import setQueryLifetime
+from refresh_engine import RefreshEngine
+from scheduler import RefreshScheduler
 from settings import checkFirstUse, loadConfig, loadServer
-from ssh_protocol import openServer, checkConnection
+from ssh_protocol import closeConnections, connectionKey, setPasswordLifetime
 
 ##-\-\-\-\-\-\-\-\-\-\-\-\
 ## MAIN GUI OF THE SOFTWARE
@@ -32,7 +36,14 @@ class mainGUI(qtw.QMainWindow):
         self.servers = []
         self.active_server = False
         self.periodic_check = False
-        self.periodic_thread = None
+        self.refresh_timers = {}
+        self.refresh_scheduler = RefreshScheduler()
+        self.refresh_engine = RefreshEngine()
+        self.network_worker = NetworkWorker(self.refresh_engine, self)
+        self.connecting = []
+        self.connect_batch = []
+        self.failed_connect = []
+        self.refreshing = []
 
         # Retrieve the configuration
         if checkFirstUse():
@@ -42,6 +53,16 @@ class mainGUI(qtw.QMainWindow):
             self.config = loadConfig()
         self.refreshServerList()
 
+        # Set how long the job lists and the passwords are reused, with the default times if the settings cannot be read
+        for setting_name, default_time, setLifetime in [('cache_time', 10, setQueryLifetime), ('password_time', 300, setPasswordLifetime)]:
+            try:
+                lifetime = float(self.config['USER'][setting_name])
+            except ValueError:
+                lifetime = default_time
+            if not lifetime >= 0:
+                lifetime = default_time
+            setLifetime(lifetime)
+
         # Generate the display
         self.setWindowTitle(self.title + " (" + self.version + ")")
         self.menuBar = menuBar(self)
@@ -64,9 +85,12 @@ class mainGUI(qtw.QMainWindow):
     # Close all background threads when the application close
     def closeEvent(self, event=None):
 
-        # Cancel the periodic check thread
-        if self.periodic_check:
-            self.periodic_thread.stop()
+        # Cancel the periodic refresh
+        self.stopPeriodicRefresh()
+
+        # Close the connections to the servers
+        self.refresh_engine.shutdown()
+        closeConnections()
 
         # Terminate
         event.accept()
@@ -137,11 +161,11 @@ class mainGUI(qtw.QMainWindow):
 
     # ------------------------------------
     # Connect to the specific given server
-    def connectSingleServer(self, name=None):
+    def connectSingleServer(self, name=None, finished=None):
 
         # Check if the server is already open
         all_names = [x.name for x in self.servers]
-        if name in all_names:
+        if name in all_names or name in self.connecting:
             errorMessage('Server already open',"The selected server ("+str(name)+") has already been opened.")
             return 0
 
@@ -151,54 +175,75 @@ class mainGUI(qtw.QMainWindow):
             errorMessage('No Server',"No Server have been defined in the memory of H-PyMon. Please add servers.")
             return 0
 
+        # Connect to the server in the background
+        self.connecting.append(name)
+        self.statusBar().showMessage('Connecting to '+str(name)+'...')
+        self.network_worker.watch( self.refresh_engine.connectServer(name), finished=partial(self.addServerTab, name, finished=finished), failed=partial(self.connectionFailed, name, finished=finished) )
+
+    # ---------------------------------------
+    # Display the server after the connection
+    def addServerTab(self, name, result, finished=None):
+
         # Get the server
-        opened_server = openServer(name, use_name=True)
+        opened_server, job_df = result
+        self.connecting.remove(name)
+        self.statusBar().clearMessage()
 
-        # Check if the connection is working
-        if not checkConnection(opened_server):
+        # Add the server to the list
+        self.servers.append( OpenedServer(opened_server) )
 
-            # Check what to do next
-            userChoice = choice2Message("No Connection", "H-PyMon cannot connect to the selected server ("+str(name)+"). Please check the settings or retry.", "Edit", icon=qtw.QMessageBox.Critical)
+        # Reset the GUI if needed
+        if len(self.servers) == 1:
 
-            # Edit the server
-            if userChoice:
-                _open_window(self, serverSettingsWindow, 'server_settings', opened_server=name, replace=True)
+            # Set the variable
+            self.active_server = True
 
-        # Load the server
-        else:
+            # Reset the background
+            self.mainWidget.deleteLater()
+            self.mainWidget = qtw.QWidget()
+            self.mainLayout = qtw.QVBoxLayout(self.mainWidget)
+
+            # Display the widget
+            self.serverTabDisplay = mainTabWidget(self.mainWidget, self)
+            self.mainLayout.addWidget( self.serverTabDisplay )
+            self.setCentralWidget(self.mainWidget)
 
-            # Add the server to the list
-            self.servers.append( OpenedServer(opened_server) )
+            # Add the button widget
+            self.genButtonWidget(self.mainLayout, add_refresh=True)
 
-            # Reset the GUI if needed
-            if len(self.servers) == 1:
+            # Load the newbackground
+            self.mainWidget.setLayout(self.mainLayout)
+            self.setCentralWidget(self.mainWidget)
 
-                # Set the variable
-                self.active_server = True
+        # Add the tab to the display
+        self.serverTabDisplay.newTab(opened_server, jobs=job_df)
 
-                # Reset the background
-                self.mainWidget.deleteLater()
-                self.mainWidget = qtw.QWidget()
-                self.mainLayout = qtw.QVBoxLayout(self.mainWidget)
+        # Schedule the periodic refresh
+        self.periodicRefresh()
 
-                # Display the widget
-                self.serverTabDisplay = mainTabWidget(self.mainWidget, self)
-                self.mainLayout.addWidget( self.serverTabDisplay )
-                self.setCentralWidget(self.mainWidget)
+        # Move to the next step
+        if finished is not None:
+            finished(name, None)
 
-                # Add the button widget
-                self.genButtonWidget(self.mainLayout, add_refresh=True)
+    # -------------------------------------
+    # Report a server that cannot be reached
+    def connectionFailed(self, name, error, finished=None):
 
-                # Load the newbackground
-                self.mainWidget.setLayout(self.mainLayout)
-                self.setCentralWidget(self.mainWidget)
+        # Remove the server from the list
+        self.connecting.remove(name)
+        self.statusBar().clearMessage()
 
-            # Add the tab to the display
-            self.serverTabDisplay.newTab(opened_server)
+        # Let the caller report the error
+        if finished is not None:
+            finished(name, error)
+            return 0
+
+        # Check what to do next
+        userChoice = choice2Message("No Connection", "H-PyMon cannot connect to the selected server ("+str(name)+"). Please check the settings or retry.", "Edit", icon=qtw.QMessageBox.Critical)
 
-            # Schedule the periodic refresh
-            if not self.periodic_check:
-                self.periodicRefresh()
+        # Edit the server
+        if userChoice:
+            _open_window(self, serverSettingsWindow, 'server_settings', opened_server=name, replace=True)
 
     # ----------------------------------------
     # Connect to all the servers in the memory
@@ -213,20 +258,41 @@ class mainGUI(qtw.QMainWindow):
             errorMessage('No Server',"No Server have been defined in the memory of H-PyMon. Please add servers.")
             return 0
 
+        # Do not start a new connection before the end of the previous one
+        if len(self.connect_batch) != 0:
+            return 0
+
+        # Get the servers that are not open yet
+        self.connect_batch = [job_name for job_address, job_name in self.server_jobs if job_name not in all_names + self.connecting]
+        self.n_connect = len(self.connect_batch)
+        self.failed_connect = []
+        if self.n_connect == 0:
+            return 0
+
         # Open the progress bar window
-        _open_window(self, progressBarWindow, 'progress_bar', title='Connection...', text='Opening Server 1/'+n_servers)
-        self.application.processEvents()
+        _open_window(self, progressBarWindow, 'progress_bar', title='Connection...', text='Opening Servers 0/'+str(self.n_connect), modal=False)
 
-        # Open all the servers if not already open
-        for i, (job_address, job_name) in enumerate(self.server_jobs):
+        # Connect to all the servers at once in the background
+        for job_name in list(self.connect_batch):
+            self.connectSingleServer(name=job_name, finished=self.updateConnectProgress)
 
-            # Load the server
-            if job_name not in all_names:
-                self.connectSingleServer(name=job_name)
+    # -------------------------------------
+    # Update the progress of the connection
+    def updateConnectProgress(self, name, error):
 
-            # Update the progress bar window
-            self.subWindows['progress_bar'].updateProgress('Opening Server '+str(i+1)+'/'+n_servers, (i+1)*100/int(n_servers))
-            self.application.processEvents()
+        # Remove the server from the list
+        self.connect_batch.remove(name)
+        if error is not None:
+            self.failed_connect.append(name)
+        n_done = self.n_connect - len(self.connect_batch)
+
+        # Update the progress bar window
+        if self.subWindows['progress_bar'] is not None:
+            self.subWindows['progress_bar'].updateProgress('Opening Servers '+str(n_done)+'/'+str(self.n_connect)+' ('+name+')', int(n_done*100/self.n_connect))
+
+        # Report all the servers that cannot be reached at once
+        if len(self.connect_batch) == 0 and len(self.failed_connect) != 0:
+            errorMessage("No Connection", "H-PyMon cannot connect to the following server(s): "+', '.join(self.failed_connect)+". Please check the settings or retry.")
 
     # -------------------------------
     # Refresh the job list in the tab
@@ -234,12 +300,28 @@ class mainGUI(qtw.QMainWindow):
 
         # Get the current tab ID
         tabIndex = self.serverTabDisplay.currentIndex()
+        crt_tab = self.serverTabDisplay.displayedTabs[tabIndex]
+
+        # Refresh the job list in the background
+        self.refreshTab(crt_tab)
 
-        # Refresh the job list in memory
-        self.serverTabDisplay.displayedTabs[tabIndex].refreshJobList()
+    # ----------------------------------------
+    # Refresh the job list of the selected tab
+    def refreshTab(self, tab):
+        self.statusBar().showMessage('Refreshing '+tab.server.name+'...')
+        remote_filter = tab.requiredFilter()
+        self.network_worker.watch( self.refresh_engine.fetchJobList(tab.server, columns=tab.requiredColumns(), remote_filter=remote_filter), finished=partial(self.displayJobList, tab, remote_filter=remote_filter), failed=partial(self.networkError, tab.server.name) )
+
+    # --------------------------------------------
+    # Display the job list received from the server
+    def displayJobList(self, tab, job_df, remote_filter=None):
+        self.statusBar().clearMessage()
+        tab.setJobList(job_df, remote_filter=remote_filter)
 
-        # Refresh the tab display
-        self.serverTabDisplay.displayedTabs[tabIndex].jobInTable()
+    # ----------------------------------------
+    # Report an error received from the server
+    def networkError(self, name, error):
+        self.statusBar().showMessage('Error on '+str(name)+': '+str(error))
 
     # -----------------------
     # Refresh the server list
@@ -263,46 +345,110 @@ class mainGUI(qtw.QMainWindow):
     def periodicRefresh(self):
 
         # Only start if allowed
-        if not self.periodic_check and self.config['USER']['autorefresh'].capitalize() == 'True':
-            self.periodic_thread = ServerRefreshTimer(self)
-            self.periodic_thread.refresh.connect(self.refreshAllServers)
-            self.periodic_thread.refresh_state.connect(self.editRefreshState)
+        if self.config['USER']['autorefresh'].capitalize() != 'True':
+            return 0
 
-    # --------------------------------------
-    # Change the status of the refresh state
-    def editRefreshState(self, isTrue):
-        self.periodic_check = isTrue
+        # Update the basic refresh time
+        self.refresh_scheduler.setRefreshTime( float( self.config['USER']['refresh_time'] ) * 60 )
+        self.periodic_check = True
 
-    # -----------------------
-    # Refresh all the servers
-    def refreshAllServers(self):
+        # Schedule the tabs without a refresh planned
+        for tab in self.serverTabDisplay.displayedTabs:
+            if tab.server is not None and tab not in self.refresh_timers.keys():
+                self.scheduleRefresh(tab, self.refresh_scheduler.planRefresh(tab.server.name))
 
-        # Save the initial tab
-        starting_tab_id = self.serverTabDisplay.currentIndex()
+    # ----------------------
+    # Stop the periodic refresh
+    def stopPeriodicRefresh(self):
 
-        # Loop over all the tabs
-        if self.active_server:
+        # Stop all the timers
+        for timer in self.refresh_timers.values():
+            timer.stop()
+        self.refresh_timers = {}
+        self.periodic_check = False
 
-            # Open the progress bar window
-            n_servers = str(len(self.server_jobs))
-            _open_window(self, progressBarWindow, 'progress_bar', title='Refresh...', text='Refreshing Server 1/'+n_servers)
-            self.application.processEvents()
+    # ---------------------------------------
+    # Plan the next refresh of a tab
+    def scheduleRefresh(self, tab, delay):
 
-            for tab_id in range(len( self.serverTabDisplay.displayedTabs )):
+        # Do not plan anything once the periodic refresh stopped
+        if not self.periodic_check:
+            return 0
 
-                # Select the current tab
-                self.serverTabDisplay.setCurrentIndex(tab_id)
+        # Create the timer of the tab
+        if tab not in self.refresh_timers.keys():
+            timer = qtc.QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(partial(self.refreshDueTabs, tab))
+            self.refresh_timers[tab] = timer
 
-                # Refresh the job list
-                self.serverTabDisplay.displayedTabs[tab_id].refreshJobList()
-                self.serverTabDisplay.displayedTabs[tab_id].selectDisplayType()
+        self.refresh_timers[tab].start( int(delay * 1000) )
 
-                # Update the progress bar window
-                self.subWindows['progress_bar'].updateProgress('Refreshing Server '+str(tab_id+1)+'/'+n_servers, (tab_id+1)*100/int(n_servers))
-                self.application.processEvents()
+    # ----------------------------------------------------
+    # Refresh a tab with the tabs sharing its connection
+    def refreshDueTabs(self, tab):
 
-        # Return to the initial tab
-        self.serverTabDisplay.setCurrentIndex(starting_tab_id)
+        # Stop if the periodic refresh has been disabled
+        if self.config['USER']['autorefresh'].capitalize() != 'True':
+            self.stopPeriodicRefresh()
+            return 0
+
+        # Do not start a new refresh of the tab before the end of the previous one
+        if tab in self.refreshing:
+            return 0
+
+        # Add the tabs of the same connection which are due soon
+        connection_key = connectionKey(tab.server)
+        tabs = [tab]
+        for other_tab, timer in self.refresh_timers.items():
+            if other_tab is not tab and other_tab not in self.refreshing and timer.isActive() and connectionKey(other_tab.server) == connection_key:
+                if timer.remainingTime() <= self.refresh_scheduler.refresh_time * self.refresh_scheduler.min_factor * 1000:
+                    timer.stop()
+                    tabs.append(other_tab)
+        self.refreshing += tabs
+
+        # Query the connection in the background
+        queries = [{'command':x.server.get_jobs, 'username':x.server.queryname, 'columns':x.requiredColumns(), 'remote_filter':x.requiredFilter()} for x in tabs]
+        self.network_worker.watch( self.refresh_engine.fetchJobLists(tab.server, queries, return_errors=True), finished=partial(self.refreshGroupDone, tabs, queries), failed=partial(self.refreshGroupFailed, tabs) )
+
+    # --------------------------------------------------
+    # Update the tabs when their connection answers
+    def refreshGroupDone(self, tabs, queries, job_dfs):
+        for tab, query, job_df in zip(tabs, queries, job_dfs):
+
+            # Only report the error to the tab whose command failed
+            if isinstance(job_df, Exception):
+                self.refreshFailed(tab, job_df)
+            else:
+                self.refreshDone(tab, job_df, remote_filter=query['remote_filter'])
+
+    # ----------------------------------------------
+    # Keep track of the failed connection query
+    def refreshGroupFailed(self, tabs, error):
+        for tab in tabs:
+            self.refreshFailed(tab, error)
+
+    # -------------------------------------
+    # Update the tab when its server answers
+    def refreshDone(self, tab, job_df, remote_filter=None):
+
+        # Refresh the job list
+        self.refreshing.remove(tab)
+        tab.setJobList(job_df, remote_filter=remote_filter)
+
+        # Plan the next refresh from the activity of the queue
+        self.scheduleRefresh(tab, self.refresh_scheduler.recordResult(tab.server.name, job_df))
+
+    # ------------------------------------
+    # Keep track of the failed server query
+    def refreshFailed(self, tab, error):
+
+        # Report the error
+        self.refreshing.remove(tab)
+        self.networkError(tab.server.name, error)
+
+        # Wait longer before the next try
+        self.scheduleRefresh(tab, self.refresh_scheduler.recordFailure(tab.server.name))
 
 ##-\-\-\-\-\-\-\-\-\-\
 ## OPENED SERVER CLASS
@@ -315,55 +461,3 @@ class OpenedServer:
         self.name = server_class.name
         self.address = server_class.ip
         self.server = server_class
-
-##-\-\-\-\-\-\
-## TIMER CLASS
-##-/-/-/-/-/-/
-
-class ServerRefreshTimer(qtc.QThread):
-
-    # Set the signals
-    refresh_state = qtc.pyqtSignal(object)
-    refresh = qtc.pyqtSignal()
-
-    # Initialise
-    def __init__(self, parent):
-        super(ServerRefreshTimer, self).__init__(parent)
-
-        self.parent_connection = parent
-
-        # Start the event
-        self.start()
-
-    # ----------------------
-    # Run the periodic event
-    def run(self):
-
-        # Set the periodic check variable to True
-        self.refresh_state.emit( True )
-        self.current_state = True
-
-        # Run the event
-        while self.current_state:
-
-            # Set the time to wait to the next iteration
-            _wait_time = float( self.parent_connection.config['USER']['refresh_time'] ) * 60
-            time.sleep(_wait_time)
-
-            # Do the refresh
-            self.refresh.emit()
-
-            # Interrupt if there is a change
-            if self.parent_connection.config['USER']['autorefresh'].capitalize() != 'True':
-                self.stop()
-
-    # -----------------------
-    # Stop the periodic event
-    def stop(self):
-
-        # Set the periodic check variable to False
-        self.current_state = False
-        self.refresh_state.emit( False )
-
-        # Stop the event
-        self.quit()
@@ -161,7 +161,7 @@ class manageDisplayWindow(qtw.QMainWindow):
 
         # Select the current tab and retrieve the job list
         _current_tab_id = self.parent.serverTabDisplay.currentIndex()
-        column_names = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].jobs.columns
+        column_names = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ].column_names
 
         # Open the new selection option
         _open_window(self.parent, selectColumnsWindow, 'column_selection', column_names=column_names)
@@ -180,8 +180,8 @@ class manageDisplayWindow(qtw.QMainWindow):
         # Get the current tab
         _current_tab_id = self.parent.serverTabDisplay.currentIndex()
         current_tab = self.parent.serverTabDisplay.displayedTabs[ _current_tab_id ]
-        job_content = current_tab.jobs.loc[0]
-        column_names = current_tab.jobs.columns
+        job_content = current_tab.example_job
+        column_names = current_tab.column_names
 
         # Load the current selection
         display_dict = loadDisplay(name)
@@ -8,7 +8,7 @@ from application_gui.common_gui_functions import CLabel, CHorizontalSeparator, w
 from application_gui.window_server_settings import serverSettingsWindow
 
 from settings import addServer, serverExists, removeServer
-from ssh_protocol import generateServer
+from ssh_protocol import clearServers, generateServer
 
 ##-\-\-\-\-\-\-\-\-\-\-\-\
 ## WINDOW FOR USER SETTINGS
@@ -174,6 +174,9 @@ class manageServerWindow(qtw.QMainWindow):
             # Delete from the file
             removeServer(name)
 
+            # Generate the servers again from the new settings
+            clearServers()
+
             # Refresh the main server list
             self.parent.refreshServerList()
 
@@ -15,12 +15,13 @@ from ssh_protocol import generateServer
 ##-/-/-/-/-/-/-/-/-/-/-/-/
 
 class progressBarWindow(qtw.QMainWindow):
-    def __init__(self, parent, title=None, text=None):
+    def __init__(self, parent, title=None, text=None, modal=True):
         super(progressBarWindow, self).__init__(parent)
 
         # Initialise the subwindow
         self.parent = parent
-        self.setWindowModality(qtc.Qt.ApplicationModal)
+        if modal:
+            self.setWindowModality(qtc.Qt.ApplicationModal)
 
         self.mainWidget = qtw.QWidget()
         self.mainLayout = qtw.QVBoxLayout(self.mainWidget)
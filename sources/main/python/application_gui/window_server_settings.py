@@ -5,7 +5,7 @@ import PyQt5.QtWidgets as qtw
 from application_gui.common_gui_functions import CLabel, CHorizontalSeparator, warningMessage, CLabelledLineEdit
 
 from settings import addServer, serverExists, getDisplayList
-from ssh_protocol import generateServer
+from ssh_protocol import clearServers, generateServer
 
 ##-\-\-\-\-\-\-\-\-\-\-\-\
 ## WINDOW FOR USER SETTINGS
@@ -259,6 +259,17 @@ class serverSettingsWindow(qtw.QMainWindow):
         self.getJobCmdEntry.setText( self.server_details['get_jobs'] )
         self.advancedSettingsLayout.addWidget(getJobCmdEntry_l)
 
+        # Add the compression of the job list
+        self.advancedSettingsLayout.addWidget( CLabel("Compression of the job list:"))
+        self.compressionComboBox = qtw.QComboBox()
+        for compression in ['none', 'ssh', 'gzip']:
+            self.compressionComboBox.addItem(compression)
+        self.compressionComboBox.setCurrentIndex( max(0, self.compressionComboBox.findText(self.server_details['compression'], qtc.Qt.MatchFixedString)) )
+        self.compressionComboBox.setStatusTip(
+            "Compress the whole connection (ssh) or the output of the commands (gzip) on slow networks."
+        )
+        self.advancedSettingsLayout.addWidget(self.compressionComboBox)
+
         # Add the entry to kill jobs
         killJobCmdEntry_l, self.killJobCmdEntry = CLabelledLineEdit('Kill jobs:')
         self.killJobCmdEntry.setText( self.server_details['kill_jobs'] )
@@ -324,6 +335,7 @@ class serverSettingsWindow(qtw.QMainWindow):
         'get_jobs': self.parent.config['USER']['get_jobs'],
         'kill_jobs': self.parent.config['USER']['kill_jobs'],
         'kill_col': self.parent.config['USER']['kill_col'],
+        'compression': 'none',
         }
 
     # ---------------------
@@ -340,6 +352,8 @@ class serverSettingsWindow(qtw.QMainWindow):
         if 'use_display' not in opened_server.keys():
             opened_server['use_display'] = False
             opened_server['display_name'] = '---'
+        if 'compression' not in opened_server.keys():
+            opened_server['compression'] = 'none'
 
         # --------------------------
 
@@ -360,7 +374,8 @@ class serverSettingsWindow(qtw.QMainWindow):
         'queryname': "",
         'get_jobs': opened_server['get_jobs'],
         'kill_jobs': opened_server['kill_jobs'],
-        'kill_col': opened_server['kill_col']
+        'kill_col': opened_server['kill_col'],
+        'compression': opened_server['compression']
         }
 
         # Check for the tunnel
@@ -440,6 +455,7 @@ class serverSettingsWindow(qtw.QMainWindow):
         'get_jobs': self.getJobCmdEntry.text(),
         'kill_jobs': self.killJobCmdEntry.text(),
         'kill_col': self.jobIdColEntry.text(),
+        'compression': self.compressionComboBox.currentText(),
         }
 
         # Check for the custom display
@@ -469,6 +485,9 @@ class serverSettingsWindow(qtw.QMainWindow):
         if save_in_file:
             addServer(server_instance)
 
+            # Generate the servers again from the new settings
+            clearServers()
+
             # Refresh the main server list
             self.parent.refreshServerList()
 
@@ -4,7 +4,9 @@ import PyQt5.QtWidgets as qtw
 
 from application_gui.common_gui_functions import CLabel, CLabelledLineEdit, warningMessage, CHorizontalSeparator
 
+from get_jobs import setQueryLifetime
 from settings import editUser
+from ssh_protocol import setPasswordLifetime
 
 ##-\-\-\-\-\-\-\-\-\-\-\-\
 ## WINDOW FOR USER SETTINGS
@@ -125,6 +127,16 @@ class userSettingsWindow(qtw.QMainWindow):
         self.getRefreshTimeEntry.setText( self.parent.config['USER']['refresh_time'] )
         self.advancedSettingsLayout.addWidget(getRefreshTimeEntry_l)
 
+        # Add the entry to reuse the job lists
+        getCacheTimeEntry_l, self.getCacheTimeEntry = CLabelledLineEdit('Reuse job lists for (s):')
+        self.getCacheTimeEntry.setText( self.parent.config['USER']['cache_time'] )
+        self.advancedSettingsLayout.addWidget(getCacheTimeEntry_l)
+
+        # Add the entry to keep the passwords in memory
+        getPasswordTimeEntry_l, self.getPasswordTimeEntry = CLabelledLineEdit('Keep passwords for (s):')
+        self.getPasswordTimeEntry.setText( self.parent.config['USER']['password_time'] )
+        self.advancedSettingsLayout.addWidget(getPasswordTimeEntry_l)
+
         self.advancedSettingsLayout.addWidget(CHorizontalSeparator())
 
         # Add a label
@@ -185,6 +197,24 @@ class userSettingsWindow(qtw.QMainWindow):
     # Save the user settings in the file
     def saveUserSettings(self):
 
+        # Check the time to reuse the job lists
+        try:
+            cache_time = float(self.getCacheTimeEntry.text())
+        except ValueError:
+            cache_time = None
+        if cache_time is None or not cache_time >= 0:
+            warningMessage("Invalid Cache Time","The time to reuse the job lists must be a positive number of seconds.", add_ok=False)
+            return 0
+
+        # Check the time to keep the passwords
+        try:
+            password_time = float(self.getPasswordTimeEntry.text())
+        except ValueError:
+            password_time = None
+        if password_time is None or not password_time >= 0:
+            warningMessage("Invalid Password Time","The time to keep the passwords must be a positive number of seconds.", add_ok=False)
+            return 0
+
         # Raise warning if the theme as been changed
         old_theme = self.parent.config['USER']['dark_theme'].capitalize() == 'True'
         if self.darkThemeCheckBox.isChecked() != old_theme:
@@ -198,12 +228,18 @@ class userSettingsWindow(qtw.QMainWindow):
         self.parent.config['USER']['autostart'] = str(self.autoConnectCheckBox.isChecked())
         self.parent.config['USER']['autorefresh'] = str(self.autoRefreshCheckBox.isChecked())
         self.parent.config['USER']['refresh_time'] = str(self.getRefreshTimeEntry.text())
+        self.parent.config['USER']['cache_time'] = str(self.getCacheTimeEntry.text())
+        self.parent.config['USER']['password_time'] = str(self.getPasswordTimeEntry.text())
         self.parent.config['USER']['get_jobs'] = self.getJobCmdEntry.text()
         self.parent.config['USER']['kill_jobs'] = self.killJobCmdEntry.text()
 
         # Save in the file
         editUser(self.parent.config['USER'])
 
+        # Apply the times to reuse the job lists and the passwords
+        setQueryLifetime(cache_time)
+        setPasswordLifetime(password_time)
+
         # Start auto refresh
         if self.autoRefreshCheckBox.isChecked() and self.parent.active_server:
             self.parent.periodicRefresh()
@@ -0,0 +1,149 @@
+import argparse
+import os
+import sys
+import time
+import zlib
+
+# Import the modules of the software
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmark_job_list import _make_job_list
+from ssh_protocol import openServer, sendCommands
+
+# Size of the data packets of an SSH channel
+_PACKET_SIZE = 32768
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ------------------------------------------------------
+# Compress the output like the SSH transport, by packets
+def _compress_ssh(data):
+
+    # Paramiko uses the default level of zlib, and flushes each packet
+    compressor = zlib.compressobj()
+    return [compressor.compress(data[i:i+_PACKET_SIZE]) + compressor.flush(zlib.Z_SYNC_FLUSH) for i in range(0, len(data), _PACKET_SIZE)]
+
+# ---------------------------------------------
+# Compress the output like gzip -c on the server
+def _compress_gzip(data):
+
+    # Use the default level of gzip, and send the result by packets
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    return [compressed[i:i+_PACKET_SIZE] for i in range(0, len(compressed), _PACKET_SIZE)]
+
+# -----------------------------------------
+# Decompress the packets received in order
+def _decompress(packets, window_bits):
+    decompressor = zlib.decompressobj(window_bits)
+    return b''.join(decompressor.decompress(x) for x in packets)
+
+##-\-\-\-\-\-\-\-\
+## PUBLIC FUNCTIONS
+##-/-/-/-/-/-/-/-/
+
+# -------------------------------------------------
+# Estimate the transfer of the job list in each mode
+def runBenchmark(n_jobs=20000, bandwidth=4, seed=0):
+
+    """ Estimate the bytes sent and the time to receive a synthetic squeue -o %all output with each compression mode of the servers.
+    The compression on the server is done locally, and the transfer time is computed from the bandwidth.
+    Argument(s):
+        - n_jobs { int } - (Opt.) Number of jobs in the job list.
+                           Default is 20000.
+        - bandwidth { float } - (Opt.) Bandwidth of the link in MB/s.
+                                Default is 4.
+        - seed { int } - (Opt.) Seed of the generator of the job list.
+                         Default is 0.
+    Output(s):
+        - results { list of dict } - Bytes sent, time to compress on the server, to transfer and to decompress locally, in seconds.
+    """
+
+    data = _make_job_list(n_jobs, seed=seed).encode('utf8')
+
+    results = []
+    for mode, compress, window_bits in [('none', None, None), ('ssh', _compress_ssh, zlib.MAX_WBITS), ('gzip', _compress_gzip, 16 + zlib.MAX_WBITS)]:
+
+        # Send the output as it is
+        if compress is None:
+            results.append({'mode':mode, 'bytes':len(data), 'compress':0., 'transfer':len(data) / (bandwidth * 1e6), 'decompress':0.})
+            continue
+
+        # Compress on the server
+        start_time = time.perf_counter()
+        packets = compress(data)
+        compress_time = time.perf_counter() - start_time
+
+        # Decompress on the client
+        start_time = time.perf_counter()
+        if _decompress(packets, window_bits) != data:
+            raise ValueError("The "+mode+" compression does not give the job list back.")
+        decompress_time = time.perf_counter() - start_time
+
+        n_bytes = sum(len(x) for x in packets)
+        results.append({'mode':mode, 'bytes':n_bytes, 'compress':compress_time, 'transfer':n_bytes / (bandwidth * 1e6), 'decompress':decompress_time})
+
+    return results
+
+# ----------------------------------------------------
+# Time the job list of a real server in each mode
+def runServerBenchmark(server_name, repeat=3):
+
+    """ Time the job list command of a server saved in the settings, with each compression mode.
+    Argument(s):
+        - server_name { str } - Name of the server in the settings.
+        - repeat { int } - (Opt.) Number of queries in each mode. The best time is kept.
+                           Default is 3.
+    Output(s):
+        - results { list of dict } - Best time in seconds and size of the output of each mode.
+    """
+
+    # Get the command of the server
+    server = openServer(server_name, use_name=True)
+    command = server.get_jobs.strip() + ' ' + server.queryname.strip()
+    saved_mode = server.compression
+
+    results = []
+    try:
+        for mode in ['none', 'ssh', 'gzip']:
+            server.compression = mode
+
+            # Open the connection before timing the queries
+            sendCommands(server, 'true')
+
+            best_time = None
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                output = sendCommands(server, command)[0]
+                run_time = time.perf_counter() - start_time
+                if best_time is None or run_time < best_time:
+                    best_time = run_time
+
+            results.append({'mode':mode, 'time':best_time, 'size':len(output.encode('utf8'))})
+
+    # Put the setting of the server back
+    finally:
+        server.compression = saved_mode
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the compression modes used to receive the job lists.")
+    parser.add_argument('--jobs', type=int, default=20000, help="Number of jobs in the synthetic job list.")
+    parser.add_argument('--bandwidth', type=float, default=4, help="Bandwidth of the link in MB/s, to estimate the transfer times.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generator of the job list.")
+    parser.add_argument('--server', default=None, help="Name of a server of the settings to also time its real job list in each mode.")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of queries to the server in each mode. The best time is kept.")
+    options = parser.parse_args()
+
+    print("Synthetic job list of "+str(options.jobs)+" jobs, link of "+str(options.bandwidth)+" MB/s")
+    for result in runBenchmark(n_jobs=options.jobs, bandwidth=options.bandwidth, seed=options.seed):
+        result['total'] = result['compress'] + result['transfer'] + result['decompress']
+        print("{mode:<5s} {mb:7.2f} MB  compress {compress:6.3f} s  transfer {transfer:6.3f} s  decompress {decompress:6.3f} s  total {total:6.3f} s".format(mb=result['bytes']/1e6, **result))
+
+    # Query a real server
+    if options.server is not None:
+        print("Job list of "+options.server)
+        for result in runServerBenchmark(options.server, repeat=options.repeat):
+            print("{mode:<5s} {mb:7.2f} MB  {time:6.3f} s".format(mb=result['size']/1e6, **result))
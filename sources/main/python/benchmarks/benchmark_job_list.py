@@ -0,0 +1,123 @@
+import argparse
+import numpy as np
+import os
+import pandas as pd
+import random
+import sys
+import time
+
+# Import the modules of the software
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from get_jobs import JobListParser
+
+# Header of squeue -o %all
+_HEADER = "ACCOUNT|TRES_PER_NODE|MIN_CPUS|MIN_TMP_DISK|END_TIME|FEATURES|GROUP|OVER_SUBSCRIBE|JOBID|NAME|COMMENT|TIME_LIMIT|MIN_MEMORY|REQ_NODES|COMMAND|PRIORITY|QOS|REASON||ST|USER|RESERVATION|WCKEY|EXC_NODES|NICE|S:C:T|JOBID|EXEC_HOST|CPUS|NODES|DEPENDENCY|ARRAY_JOB_ID|GROUP|SOCKETS_PER_NODE|CORES_PER_SOCKET|THREADS_PER_CORE|ARRAY_TASK_ID|TIME_LEFT|TIME|NODELIST|CONTIGUOUS|PARTITION|PRIORITY|NODELIST(REASON)|START_TIME|STATE|UID|SUBMIT_TIME|LICENSES|CORE_SPEC|SCHEDNODES|WORK_DIR"
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ------------------------------------------------
+# Generate the output of squeue for a number of jobs
+def _make_job_list(n_jobs, seed=0):
+
+    # Always generate the same jobs
+    generator = random.Random(seed)
+
+    # Mix running and pending jobs, with array jobs
+    all_lines = [_HEADER]
+    for i in range(n_jobs):
+        job_id = str(1000000 + i) if generator.random() < 0.8 else str(1000000 + i) + '_' + str(generator.randint(1, 50))
+        if generator.random() < 0.5:
+            state, start_time, time_left = 'RUNNING', '2024-01-01T10:00:00', '0:' + str(generator.randint(10, 59)) + ':00'
+        else:
+            state, start_time, time_left = 'PENDING', 'N/A', '1-00:00:00'
+        work_dir = '/home/user/project' + str(i % 7) + '/run' + str(i % 13)
+        all_lines.append( "acc|N/A|1|0|2024-01-02T10:00:00|(null)|grp|OK|"+job_id+"|my job "+str(i)+"|(null)|1-00:00:00|4G||"+work_dir+"/run.sh arg|0.0001|normal|None||"+state[0]+"|user|(null)|(null)||0|*:*:*|"+job_id+"|n/a|"+str(generator.choice([1, 4, 16]))+"|1||"+job_id.split('_')[0]+"|1000|*|*|*|N/A|"+time_left+"|0:00||0|batch|"+str(generator.randint(1, 99999))+"|(None)|"+start_time+"|"+state+"|1000|2024-01-01T09:00:00|(null)|N/A|(null)|"+work_dir )
+
+    return '\n'.join(all_lines) + '\n'
+
+# -------------------------------------------------------------
+# Convert the job list like the software did before the parser
+def _reference_list2df(raw_joblist):
+
+    # Convert the job list in an array of string
+    all_jobs = raw_joblist.strip().split('\n')
+
+    job_array = []
+    for job in all_jobs:
+        job_array.append(job.replace(" ", "").split('|'))
+    job_array = np.array(job_array).T
+
+    # Convert the array into a dataframe
+    job_df = pd.DataFrame( {job_array[0,0]:job_array[0,1:]} )
+    for i in range(1, job_array.shape[0]):
+        job_df[job_array[i,0]] = job_array[i,1:]
+
+    return job_df
+
+# ----------------------------------------------------------
+# Parse the job list by chunks, as it arrives from the server
+def _parse_job_list(raw_joblist, chunk_size=65536):
+    parser = JobListParser()
+    for i in range(0, len(raw_joblist), chunk_size):
+        parser.feed(raw_joblist[i:i+chunk_size])
+
+    return parser.close()
+
+# ----------------------------------------
+# Get the best time of several repetitions
+def _best_time(function, argument, repeat=3):
+
+    best_time = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(argument)
+        run_time = time.perf_counter() - start_time
+        if best_time is None or run_time < best_time:
+            best_time = run_time
+
+    return best_time, result
+
+##-\-\-\-\-\-\-\-\
+## PUBLIC FUNCTIONS
+##-/-/-/-/-/-/-/-/
+
+# -----------------------------
+# Compare the two job list parsers
+def runBenchmark(job_counts=(1000, 10000, 50000), repeat=3, seed=0):
+
+    """ Time the conversion of synthetic squeue -o %all outputs into tables, with the previous conversion and with JobListParser.
+    Argument(s):
+        - job_counts { list of int } - (Opt.) Numbers of jobs in the job lists to convert.
+                                       Default is (1000, 10000, 50000).
+        - repeat { int } - (Opt.) Number of runs of each conversion. The best time is kept.
+                           Default is 3.
+        - seed { int } - (Opt.) Seed of the generator of the job lists.
+                         Default is 0.
+    Output(s):
+        - results { list of dict } - Time in seconds and memory in bytes of each conversion.
+    """
+
+    results = []
+    for n_jobs in job_counts:
+        raw_joblist = _make_job_list(n_jobs, seed=seed)
+
+        # Convert the same job list with both methods
+        for method_name, function in [('reference', _reference_list2df), ('parser', _parse_job_list)]:
+            run_time, job_df = _best_time(function, raw_joblist, repeat=repeat)
+            results.append({'jobs':n_jobs, 'method':method_name, 'time':run_time, 'memory':job_df.memory_usage(deep=True).sum()})
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the conversion of the squeue output into a table of jobs.")
+    parser.add_argument('--jobs', type=int, action='append', default=None, help="Number of jobs in the job list. Can be used several times. Default is 1000, 10000 and 50000.")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of runs of each conversion. The best time is kept.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generator of the job lists.")
+    options = parser.parse_args()
+
+    job_counts = options.jobs if options.jobs is not None else (1000, 10000, 50000)
+    print("pandas "+pd.__version__+", python "+sys.version.split()[0])
+    for result in runBenchmark(job_counts=job_counts, repeat=options.repeat, seed=options.seed):
+        print("{jobs:>7d} jobs  {method:<10s} {time:8.3f} s  {memory_mb:8.1f} MB".format(memory_mb=result['memory']/1e6, **result))
@@ -0,0 +1,124 @@
+import argparse
+import os
+import pandas as pd
+import random
+import sys
+import time
+
+# Import the modules of the software
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import selection
+from selection import _select_indices, _splitall
+
+# Folder names used in the synthetic paths
+_FOLDER_NAMES = ['lipid', 'protein', 'DPPC', 'DOPC', 'POPC', 'water', 'run1', 'run2', 'run3', 'analysis']
+
+# Conditions on the path elements, as (position, accepted values)
+_PATH_CONDITIONS = [(2, ['project1', 'project3']), (3, ['DPPC', 'DOPC'])]
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ----------------------------------------------
+# Generate the working directories of the jobs
+def _make_paths(n_jobs, n_unique=None, seed=0):
+
+    # Always generate the same paths
+    generator = random.Random(seed)
+
+    # Generate each distinct path
+    if n_unique is None:
+        n_unique = n_jobs
+    unique_paths = []
+    for i in range(n_unique):
+        folders = [generator.choice(_FOLDER_NAMES) for _ in range(generator.randint(2, 5))]
+        unique_paths.append( '/home/user/project' + str(i % 5) + '/' + '/'.join(folders) + '/job' + str(i) )
+
+    # Share the paths between the jobs
+    all_paths = [unique_paths[i % n_unique] for i in range(n_jobs)]
+    generator.shuffle(all_paths)
+
+    return pd.DataFrame({'WORK_DIR':all_paths})
+
+# -------------------------------------------------------------
+# Select the jobs like the software did before the vectorisation
+def _reference_select_indices(job_df, path_conditions, column_name='WORK_DIR'):
+
+    # Select the indices
+    selected_jobs = []
+    for job_id, job_path in enumerate(job_df[column_name]):
+
+        # Split the path in the column
+        path_elements = [x for x in _splitall(job_path) if x not in ["/", "\\"]]
+
+        # Check if the ID should be kept or not
+        keep_id = True
+        for condition_index, condition_values in path_conditions:
+            if not path_elements[condition_index] in condition_values:
+                keep_id = False
+
+        # Append the ID if the job can be kept
+        if keep_id:
+            selected_jobs.append(job_id)
+
+    return selected_jobs
+
+# ----------------------------
+# Time a single selection
+def _time_selection(function, job_df):
+    start_time = time.perf_counter()
+    selected_jobs = function(job_df, _PATH_CONDITIONS)
+
+    return time.perf_counter() - start_time, selected_jobs
+
+##-\-\-\-\-\-\-\-\
+## PUBLIC FUNCTIONS
+##-/-/-/-/-/-/-/-/
+
+# ---------------------------------
+# Compare the selections of the jobs
+def runBenchmark(n_jobs=100000, unique_counts=(None, 100), seed=0):
+
+    """ Time the selection of the jobs on their working directories, with the previous loop and with the vectorised selection.
+    Argument(s):
+        - n_jobs { int } - (Opt.) Number of jobs in the job list.
+                           Default is 100000.
+        - unique_counts { list of int } - (Opt.) Numbers of distinct paths in the job list. None gives a different path to each job.
+                                          Default is (None, 100).
+        - seed { int } - (Opt.) Seed of the generator of the paths.
+                         Default is 0.
+    Output(s):
+        - results { list of dict } - Time in seconds of each selection.
+    """
+
+    results = []
+    for n_unique in unique_counts:
+        job_df = _make_paths(n_jobs, n_unique=n_unique, seed=seed)
+        n_paths = n_jobs if n_unique is None else n_unique
+
+        # Select the jobs with the previous loop
+        run_time, reference_jobs = _time_selection(_reference_select_indices, job_df)
+        results.append({'paths':n_paths, 'method':'reference', 'time':run_time})
+
+        # Select the jobs with an empty cache, then with the paths already split
+        selection._path_cache.clear()
+        for method_name in ['vectorised', 'cached']:
+            run_time, selected_jobs = _time_selection(_select_indices, job_df)
+            if list(selected_jobs) != reference_jobs:
+                raise ValueError("The "+method_name+" selection does not select the same jobs.")
+            results.append({'paths':n_paths, 'method':method_name, 'time':run_time})
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the selection of the jobs on their working directories.")
+    parser.add_argument('--jobs', type=int, default=100000, help="Number of jobs in the job list.")
+    parser.add_argument('--unique', type=int, action='append', default=None, help="Number of distinct paths. Can be used several times. Default is one path per job, then 100 paths.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generator of the paths.")
+    options = parser.parse_args()
+
+    unique_counts = options.unique if options.unique is not None else (None, 100)
+    print("pandas "+pd.__version__+", python "+sys.version.split()[0]+", "+str(options.jobs)+" jobs")
+    for result in runBenchmark(n_jobs=options.jobs, unique_counts=unique_counts, seed=options.seed):
+        print("{paths:>7d} paths  {method:<10s} {time:8.3f} s".format(**result))
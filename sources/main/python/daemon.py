@@ -0,0 +1,423 @@
+from appdirs import AppDirs
+import argparse
+import json
+import os
+import pandas as pd
+import signal
+import socketserver
+import tempfile
+import threading
+import time
+
+from refresh_engine import RefreshEngine
+from scheduler import RefreshScheduler
+from selection import loadCustomDisplay
+from settings import getDisplayList, loadConfig
+from ssh_protocol import closeConnections, connectionKey, openServer
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ----------------------------------------
+# Return the default path of the job file
+def _return_output_path():
+
+    # Search the default directory of the system
+    default_directory = AppDirs('HPyMon', 'daemon', version="1.0")
+    default_directory = default_directory.user_data_dir
+
+    return os.path.join(default_directory, 'daemon', 'jobs.json')
+
+# ------------------------------------------
+# Convert a table of jobs in a list of dicts
+def _jobs2records(job_df, columns=None):
+
+    # Only keep the columns available
+    if columns is not None:
+        job_df = job_df[ [x for x in columns if x in job_df.columns] ]
+
+    return json.loads( job_df.to_json(orient='records', date_format='iso') )
+
+# ---------------------------------------------
+# Convert a sorted job selection for the output
+def _sorted2records(job_list, columns=None):
+
+    # Process a dictionary
+    if isinstance(job_list, dict):
+        return {str(x):_sorted2records(job_list[x], columns=columns) for x in job_list.keys()}
+
+    return _jobs2records(job_list, columns=columns)
+
+# ---------------------------------------
+# Apply a custom display to the job list
+def _apply_display(display, job_df):
+
+    # Get the columns to display
+    if display.display_type == 'selection':
+        columns = None
+    else:
+        columns = display.columns
+
+    # Process a column selection
+    if display.display_type == 'column':
+        return {'type':display.display_type, 'jobs':_jobs2records(job_df, columns=columns)}
+
+    # Process a custom selection
+    job_list = display.selectedJobs(job_df)
+
+    return {'type':display.display_type, 'jobs':_sorted2records(job_list, columns=columns)}
+
+# ---------------------------------------------------------
+# Get the query retrieving only the jobs needed by a display
+def _display_query(server, display):
+
+    # Get the columns to display, with the ones used to follow the queue
+    if display.display_type == 'selection':
+        columns = None
+    else:
+        columns = list(display.columns) + ['JOBID', 'STATE', 'TIME_LEFT']
+
+    # Filter the jobs on the server
+    remote_filter = None
+    if display.selection is not None:
+        if columns is not None:
+            columns.append( display.selection.column )
+        remote_filter = display.selection.remoteFilter()
+
+    return {'command':server.get_jobs, 'username':server.queryname, 'columns':columns, 'remote_filter':remote_filter}
+
+# ----------------------------------------------
+# Save the content of a file in a single step
+def _write_file(content, file_path):
+
+    # Check if the folders exist
+    if not os.path.exists(os.path.dirname(file_path)):
+        os.makedirs(os.path.dirname(file_path))
+
+    # Write the whole content in a temporary file first
+    file_id, temp_path = tempfile.mkstemp(prefix='.'+os.path.basename(file_path)+'.', suffix='.tmp', dir=os.path.dirname(file_path))
+    try:
+        with os.fdopen(file_id, 'wb') as output_file:
+            output_file.write(content)
+
+        # Replace the file in one step
+        os.replace(temp_path, file_path)
+
+    # Do not leave the temporary file behind
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+##-\-\-\-\-\-\-\-\-\
+## SOCKET SERVER CLASS
+##-/-/-/-/-/-/-/-/-/
+
+class _JobRequestHandler(socketserver.BaseRequestHandler):
+
+    # ----------------------------------------
+    # Send the last job lists to the client
+    def handle(self):
+        self.request.sendall( self.server.monitor_daemon.lastContent() )
+
+class _JobSocketServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+##-\-\-\-\-\-\-\-\
+## DAEMON CLASS
+##-/-/-/-/-/-/-/-/
+
+class MonitorDaemon:
+    def __init__(self, output_path=None, port=None, refresh_time=None, display_names=None, timeout=60, displays_only=False):
+
+        # Get the settings of the daemon
+        self.output_path = output_path
+        self.port = port
+        self.refresh_time = refresh_time
+        self.display_names = display_names
+        self.displays_only = displays_only
+
+        # Initialise the last results
+        self.results = {}
+        self.content = b'{}\n'
+        self.content_lock = threading.Lock()
+
+        # Initialise the workers
+        self.refresh_engine = RefreshEngine(timeout=timeout)
+        self.refresh_scheduler = RefreshScheduler()
+        self.socket_server = None
+        self.stop_event = threading.Event()
+
+    ##-\-\-\-\-\-\-\-\
+    ## POLL THE SERVERS
+    ##-/-/-/-/-/-/-/-/
+
+    # -------------------------------------------
+    # Get the job lists of the servers once
+    def pollOnce(self, server_names=None):
+
+        """ Retrieve the job lists of the servers reading the jobs, apply the custom displays and publish the results.
+        Argument(s):
+            - server_names { list of str } - (Opt.) Names of the servers to refresh.
+                                             Default is None (all the servers reading the jobs).
+        Output(s):
+            - results { dict } - Dictionary of the published results, for all the servers.
+        """
+
+        # Get the servers reading the jobs
+        config = loadConfig()
+        read_servers = self._get_servers(config)
+        if server_names is None:
+            server_names = read_servers
+        server_names = [x for x in server_names if x in read_servers]
+
+        # Forget the servers removed from the settings
+        for server_name in list(self.results.keys()):
+            if server_name not in read_servers:
+                del self.results[server_name]
+                self.refresh_scheduler.remove(server_name)
+
+        # Get the custom displays to apply
+        displays = self._load_displays()
+
+        # Get the servers, only generated again when the settings change
+        servers = {}
+        for server_name in server_names:
+            try:
+                servers[server_name] = openServer(server_name, use_name=True)
+            except Exception as error:
+                self._save_result(config, server_name, None, error, displays)
+
+        # Group the servers reached through the same connection
+        server_groups = {}
+        for server_name, server in servers.items():
+            server_groups.setdefault(connectionKey(server), []).append(server_name)
+
+        # Query each connection once, with the job lists of all its servers
+        futures = {}
+        for group_names in server_groups.values():
+            all_queries = [self._get_queries(servers[x], displays) for x in group_names]
+            future = self.refresh_engine.fetchJobLists(servers[group_names[0]], [x for queries in all_queries for x in queries], return_errors=True)
+            futures[future] = (group_names, [len(x) for x in all_queries])
+
+        # Process the job lists as soon as they arrive
+        for (group_names, n_queries), job_dfs, error in self.refresh_engine.iterResults(futures):
+            for server_name, n_query in zip(group_names, n_queries):
+                if error is not None:
+                    self._save_result(config, server_name, None, error, displays)
+                    continue
+
+                # Only report the error to the server whose command failed
+                server_dfs, job_dfs = job_dfs[:n_query], job_dfs[n_query:]
+                server_errors = [x for x in server_dfs if isinstance(x, Exception)]
+                if len(server_errors) != 0:
+                    self._save_result(config, server_name, None, server_errors[0], displays)
+                else:
+                    self._save_result(config, server_name, server_dfs, None, displays)
+
+        # Publish the results
+        results = {'time':time.strftime('%Y-%m-%dT%H:%M:%S'), 'servers':self.results}
+        self.publish(results)
+
+        return results
+
+    # -----------------------------------------
+    # Make the results available to the clients
+    def publish(self, results):
+
+        # Save the content for the socket
+        content = (json.dumps(results) + '\n').encode('utf-8')
+        with self.content_lock:
+            self.content = content
+
+        # Save the content in the file
+        if self.output_path is not None:
+            _write_file(content, self.output_path)
+
+    # -------------------------------
+    # Get the last published results
+    def lastContent(self):
+        with self.content_lock:
+            return self.content
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## RUN THE DAEMON
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ----------------------------------------
+    # Poll the servers until the daemon stops
+    def run(self):
+
+        # Start sharing the results on the local socket
+        if self.port is not None:
+            self.socket_server = _JobSocketServer(('127.0.0.1', self.port), _JobRequestHandler)
+            self.socket_server.monitor_daemon = self
+            threading.Thread(target=self.socket_server.serve_forever, daemon=True).start()
+
+        try:
+            while not self.stop_event.is_set():
+
+                # Refresh the servers that are due
+                refresh_time = self._get_refresh_time() * 60
+                self.refresh_scheduler.setRefreshTime(refresh_time)
+                server_names = self._get_servers(loadConfig())
+                due_servers = self.refresh_scheduler.dueServers(server_names)
+                if len(due_servers) != 0:
+                    self.pollOnce(server_names=due_servers)
+
+                # Wait for the next server
+                delay = self.refresh_scheduler.nextDelay(server_names)
+                if delay is None:
+                    delay = refresh_time
+                self.stop_event.wait(delay)
+
+        # Close everything
+        finally:
+            self.shutdown()
+
+    # --------------------
+    # Stop the daemon
+    def stop(self, *args):
+        self.stop_event.set()
+
+    # -------------------------------
+    # Close the socket and the servers
+    def shutdown(self):
+        if self.socket_server is not None:
+            self.socket_server.shutdown()
+            self.socket_server.server_close()
+            self.socket_server = None
+        self.refresh_engine.shutdown()
+        closeConnections()
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # -------------------------------------------
+    # Get the job lists to retrieve from a server
+    def _get_queries(self, server, displays):
+
+        # Only retrieve the jobs and the columns needed by each display
+        if self.displays_only:
+            return [_display_query(server, x) for x in displays]
+
+        # Retrieve the full job list otherwise
+        return [{'command':server.get_jobs, 'username':server.queryname}]
+
+    # -------------------------------------------
+    # Apply the displays to the job lists of a server
+    def _save_result(self, config, server_name, job_dfs, error, displays):
+        server_results = {'address':config[server_name]['address'], 'time':time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+        # Report the servers that did not answer
+        if error is not None:
+            server_results['error'] = str(error)
+            self.refresh_scheduler.recordFailure(server_name)
+            self.results[server_name] = server_results
+            return 0
+
+        # Follow the activity of the queue with all the jobs received
+        if self.displays_only:
+            job_df = pd.concat(job_dfs, ignore_index=True) if len(job_dfs) != 0 else pd.DataFrame()
+            if 'JOBID' in job_df.columns:
+                job_df = job_df.drop_duplicates(subset='JOBID')
+            display_dfs = job_dfs
+        else:
+            job_df = job_dfs[0]
+            server_results['n_jobs'] = len(job_df)
+            server_results['jobs'] = _jobs2records(job_df)
+            display_dfs = job_dfs * len(displays)
+        self.refresh_scheduler.recordResult(server_name, job_df)
+
+        # Apply the displays to the job lists
+        server_results['displays'] = {}
+        for display, display_df in zip(displays, display_dfs):
+            try:
+                server_results['displays'][display.name] = _apply_display(display, display_df)
+            except (KeyError, ValueError) as display_error:
+                server_results['displays'][display.name] = {'type':display.display_type, 'error':str(display_error)}
+
+        self.results[server_name] = server_results
+
+    # -------------------------------------
+    # Get the servers reading the jobs
+    def _get_servers(self, config):
+        return [x for x in config.keys() if x != 'USER' and config[x]['read_jobs'] == 'True']
+
+    # ------------------------------------
+    # Load the custom displays to apply
+    def _load_displays(self):
+
+        # Get the names of the displays
+        display_names = getDisplayList()
+        if self.display_names is not None:
+            display_names = [x for x in display_names if x in self.display_names]
+
+        return [loadCustomDisplay(x) for x in display_names]
+
+    # -------------------------------------
+    # Get the time in minutes between polls
+    def _get_refresh_time(self):
+
+        # Use the time of the user settings by default
+        if self.refresh_time is not None:
+            return self.refresh_time
+
+        return float( loadConfig()['USER']['refresh_time'] )
+
+##-\-\-\-\-\-\-\-\
+## PUBLIC FUNCTIONS
+##-/-/-/-/-/-/-/-/
+
+# ---------------------------------
+# Read the options of the command
+def parseArguments(arguments=None):
+
+    """ Read the options of the daemon from the command line.
+    Argument(s):
+        - arguments { list of str } - (Opt.) Options to read.
+                                      Default is None (options of the command line).
+    Output(s):
+        - options { argparse Namespace } - Options of the daemon.
+    """
+
+    parser = argparse.ArgumentParser(description="Retrieve the job lists of all the servers on a schedule, without the interface, and share them with several clients.")
+    parser.add_argument('--output', default=_return_output_path(), help="File to write the job lists in, as JSON. Use 'none' to disable.")
+    parser.add_argument('--port', type=int, default=None, help="Port of the local socket sending the job lists to the clients.")
+    parser.add_argument('--refresh-time', type=float, default=None, help="Base time in minutes between two refreshes of a server, adapted to the activity of its queue. Default is the time of the user settings.")
+    parser.add_argument('--display', action='append', default=None, help="Name of a custom display to apply. Can be used several times. Default is all the displays.")
+    parser.add_argument('--timeout', type=float, default=60, help="Time in seconds to wait for each server.")
+    parser.add_argument('--once', action='store_true', help="Refresh the job lists once and exit.")
+    parser.add_argument('--displays-only', action='store_true', help="Only retrieve the jobs and the columns needed by the custom displays, filtered on the servers, without publishing the full job lists.")
+
+    options = parser.parse_args(arguments)
+
+    # Disable the file output
+    if options.output.lower() == 'none':
+        options.output = None
+
+    return options
+
+if __name__ == '__main__':
+    options = parseArguments()
+
+    # Prepare the daemon
+    monitor_daemon = MonitorDaemon(output_path=options.output, port=options.port, refresh_time=options.refresh_time, display_names=options.display, timeout=options.timeout, displays_only=options.displays_only)
+
+    # Refresh once
+    if options.once:
+        try:
+            monitor_daemon.pollOnce()
+        finally:
+            monitor_daemon.shutdown()
+
+    # Refresh until stopped
+    else:
+        signal.signal(signal.SIGTERM, monitor_daemon.stop)
+        try:
+            monitor_daemon.run()
+        except KeyboardInterrupt:
+            pass
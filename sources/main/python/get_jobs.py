@@ -1,53 +1,355 @@
+from concurrent.futures import Future
+import csv
+import io
 import numpy as np
 import pandas as pd
+import re
+import threading
+import time
+import warnings
 
-from selection import getSelection
-from ssh_protocol import sendCommands
+from selection import getSelection, makeSelection
+from ssh_protocol import connectionKey, sendCommands
+
+# Spaces around the separators and at the end of the lines
+_FIELD_PADDING = re.compile(r' +(?=[|\n])|(?<=[|\n]) +')
+
+# Field codes of squeue for the columns of squeue -o %all
+_SQUEUE_FIELDS = {
+'ACCOUNT':'%a', 'TRES_PER_NODE':'%b', 'MIN_CPUS':'%c', 'MIN_TMP_DISK':'%d', 'END_TIME':'%e', 'FEATURES':'%f',
+'OVER_SUBSCRIBE':'%h', 'NAME':'%j', 'COMMENT':'%k', 'TIME_LIMIT':'%l', 'MIN_MEMORY':'%m', 'REQ_NODES':'%n',
+'COMMAND':'%o', 'QOS':'%q', 'REASON':'%r', 'ST':'%t', 'USER':'%u', 'RESERVATION':'%v', 'WCKEY':'%w',
+'EXC_NODES':'%x', 'NICE':'%y', 'S:C:T':'%z', 'JOBID':'%A', 'EXEC_HOST':'%B', 'CPUS':'%C', 'NODES':'%D',
+'DEPENDENCY':'%E', 'ARRAY_JOB_ID':'%F', 'GROUP':'%G', 'SOCKETS_PER_NODE':'%H', 'CORES_PER_SOCKET':'%I',
+'THREADS_PER_CORE':'%J', 'ARRAY_TASK_ID':'%K', 'TIME_LEFT':'%L', 'TIME':'%M', 'NODELIST':'%N',
+'CONTIGUOUS':'%O', 'PARTITION':'%P', 'PRIORITY':'%Q', 'NODELIST(REASON)':'%R', 'START_TIME':'%S',
+'STATE':'%T', 'UID':'%U', 'SUBMIT_TIME':'%V', 'LICENSES':'%W', 'CORE_SPEC':'%X', 'SCHEDNODES':'%Y',
+'WORK_DIR':'%Z'
+}
+
+# Columns converted to integers, with missing values for the other fields (JOBID is kept as text for the array jobs, e.g. 123_4)
+_INTEGER_COLUMNS = ['ARRAY_JOB_ID', 'CPUS', 'MIN_CPUS', 'NODES', 'NICE', 'PRIORITY', 'UID']
+
+# Columns converted to dates, with missing values for the other fields (e.g. N/A)
+_DATETIME_COLUMNS = ['SUBMIT_TIME', 'START_TIME', 'END_TIME']
 
 ##-\-\-\-\-\-\-\-\-\
 ## PRIVATE FUNCTIONS
 ##-/-/-/-/-/-/-/-/-/
 
+# -------------------------------------------------
+# Only request the given columns from the server
+def _project_command(command, columns):
+
+    # Keep the full command if all the columns are needed
+    if columns is None or '%all' not in command:
+        return command
+
+    # Get the field codes of the columns
+    field_codes = []
+    for column_name in columns:
+        if column_name not in _SQUEUE_FIELDS.keys():
+            return command
+        if _SQUEUE_FIELDS[column_name] not in field_codes:
+            field_codes.append( _SQUEUE_FIELDS[column_name] )
+
+    return command.replace('%all', '"' + '|'.join(field_codes) + '"')
+
 # --------------------------
 # Get the list on the server
-def _get_on_server(server, command='squeue -o %all -u', username=None):
+def _get_on_server(server, command='squeue -o %all -u', username=None, columns=None, timeout=None, remote_filter=None):
 
     # Get the full command line
+    command = _full_command(server, command=command, username=username, columns=columns, remote_filter=remote_filter)
+
+    # Share the query with the other callers asking for the same list
+    query_key = (connectionKey(server), command)
+    future, is_owner = _query_cache.claim(query_key)
+    if is_owner:
+
+        # Fetch the information on the server, and parse it while it arrives
+        try:
+            job_df = sendCommands(server, command, output=True, timeout=timeout, parser=JobListParser)[0]
+        except BaseException as error:
+            _query_cache.complete(query_key, error=error)
+            raise
+        _query_cache.complete(query_key, result=job_df)
+
+    return future.result()
+
+# --------------------------------------------
+# Get the command line to send to the server
+def _full_command(server, command='squeue -o %all -u', username=None, columns=None, remote_filter=None):
+
+    # Add the user to the command
+    command = _project_command(command, columns)
     if username is None:
         username = server.username
     command = command.strip() + ' ' + username.strip()
 
-    # Fetch the information on the server
-    raw_joblist = sendCommands(server, command, output=True)
+    # Filter the jobs on the server
+    if remote_filter is not None:
+        command += ' | ' + remote_filter
+
+    return command
 
-    return raw_joblist
+# ----------------------------------------------------
+# Get the filter of the selection to run on the server
+def _get_remote_filter(selection=None, column_name='WORK_DIR', remote_filter=None):
 
-# ----------------------------------------------
-# Convert the raw job list in a pandas dataframe
-def _list2df(raw_joblist):
+    # Use the filter provided
+    if remote_filter is not None or selection is None:
+        return remote_filter
 
-    # Convert the job list in an array of string
-    all_jobs = raw_joblist.strip().split('\n')
+    # Turn the selection into a class if it's a dictionary
+    if isinstance(selection, dict):
+        selection = makeSelection(selection, column_name=column_name)
 
-    job_array = []
-    for job in all_jobs:
-        job_array.append(job.replace(" ", "").split('|'))
-    job_array = np.array(job_array).T
+    return selection.remoteFilter()
 
-    # Convert the array into a dataframe
-    job_df = pd.DataFrame( {job_array[0,0]:job_array[0,1:]} )
-    for i in range(1, job_array.shape[0]):
-        job_df[job_array[i,0]] = job_array[i,1:]
+# ---------------------------------------------
+# Split the lines of the job list in the C parser
+def _read_fields(raw_body, n_columns):
+
+    # Remove the padding around the fields, if any
+    raw_body = raw_body.strip()
+    if ' |' in raw_body or '| ' in raw_body or ' \n' in raw_body or '\n ' in raw_body:
+        raw_body = _FIELD_PADDING.sub('', raw_body)
+
+    # Read all the fields as strings, ignoring the extra fields
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.ParserWarning)
+        field_df = pd.read_csv(io.StringIO(raw_body), sep='|', header=None, names=range(n_columns), dtype=str, na_filter=False, quoting=csv.QUOTE_NONE, index_col=False, engine='c')
+
+    return field_df
+
+# ----------------------------------------------------------
+# Convert the columns of numbers and dates, always the same way
+def _convert_types(job_df):
+
+    # Convert the integers, the other fields become missing values
+    for column_name in _INTEGER_COLUMNS:
+        if column_name in job_df.columns:
+            numbers = pd.to_numeric(job_df[column_name], errors='coerce')
+            job_df[column_name] = numbers.where(numbers.round() == numbers).astype('Int64')
+
+    # Convert the dates, the other fields become missing dates
+    for column_name in _DATETIME_COLUMNS:
+        if column_name in job_df.columns:
+            job_df[column_name] = pd.to_datetime(job_df[column_name], format='%Y-%m-%dT%H:%M:%S', errors='coerce').astype('datetime64[ns]')
+
+    return job_df
+
+# ------------------------------------------
+# Apply the selection to the job list
+def _select_jobs(job_df, selection=None, column_name='WORK_DIR'):
+
+    # Return only the selected columns if required
+    if selection is not None:
+        job_df = getSelection(job_df, selection, column_name=column_name)
 
     return job_df
 
+##-\-\-\-\-\-\-\-\-\-\-\
+## JOB LIST PARSER CLASS
+##-/-/-/-/-/-/-/-/-/-/-/
+
+# Define the parser of a job list received by pieces
+class JobListParser:
+    def __init__(self, block_size=1048576):
+
+        # Get the settings of the parser
+        self.block_size = block_size
+
+        # Initialise the content of the job list
+        self.column_ids = None
+        self.n_columns = 0
+        self.pieces = []
+        self.size = 0
+        self.blocks = []
+
+    # --------------------------------------
+    # Add the next piece of the job list
+    def feed(self, text):
+
+        # Keep the text until there is enough to parse
+        self.pieces.append(text)
+        self.size += len(text)
+        if self.column_ids is not None and self.size < self.block_size:
+            return 0
+
+        # Get all the text not parsed yet
+        text = ''.join(self.pieces)
+
+        # Read the header first
+        if self.column_ids is None:
+            text = text.lstrip()
+            if '\n' not in text:
+                self._keep(text)
+                return 0
+            header, _, text = text.partition('\n')
+            self._read_header(header)
+
+        # Parse the complete lines, and keep the last one for later
+        last_line = text.rfind('\n') + 1
+        self._parse(text[:last_line])
+        self._keep(text[last_line:])
+
+    # ---------------------------------------
+    # Parse the rest of the job list
+    def close(self):
+
+        """ Parse the end of the job list.
+        Output(s):
+            - job_df { pandas DataFrame } - Table with all the jobs and their properties.
+        """
+
+        # Get all the text not parsed yet
+        text = ''.join(self.pieces)
+        self._keep('')
+
+        # Read the header if it was not complete
+        if self.column_ids is None:
+            header, _, text = text.strip().partition('\n')
+            self._read_header(header)
+
+        # Parse the last lines
+        self._parse(text)
+
+        # Return an empty table if there is no job
+        if len(self.blocks) == 0:
+            return _convert_types( pd.DataFrame(columns=list(self.column_ids.keys()), dtype=str) )
+
+        # Join all the blocks
+        if len(self.blocks) == 1:
+            field_df = self.blocks[0]
+        else:
+            field_df = pd.concat(self.blocks, ignore_index=True)
+        self.blocks = []
+
+        # Convert the array into a dataframe
+        job_df = pd.DataFrame( {column_name:field_df[i] for column_name, i in self.column_ids.items()} )
+
+        return _convert_types(job_df)
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ---------------------------
+    # Get the names of the columns
+    def _read_header(self, header):
+
+        # Keep the last occurrence of the duplicated columns, at the position of the first one
+        column_names = [x.strip() for x in header.split('|')]
+        self.n_columns = len(column_names)
+        self.column_ids = {}
+        for i, column_name in enumerate(column_names):
+            self.column_ids[column_name] = i
+
+    # ----------------------------------
+    # Keep the text to parse it later
+    def _keep(self, text):
+        self.pieces = [text]
+        self.size = len(text)
+
+    # ------------------------------------
+    # Read the fields of a block of lines
+    def _parse(self, text):
+        if text.strip() != '':
+            self.blocks.append( _read_fields(text, self.n_columns) )
+
+##-\-\-\-\-\-\-\-\-\
+## QUERY CACHE CLASS
+##-/-/-/-/-/-/-/-/-/
+
+# Define the cache sharing the job lists between the callers
+class QueryCache:
+    def __init__(self, lifetime=10):
+
+        # Get the settings of the cache
+        self.lifetime = lifetime
+
+        # Initialise the content of the cache
+        self.results = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    # ---------------------------------------------------
+    # Get the future result of a query, or run it first
+    def claim(self, key):
+
+        """ Get the result of a query from the cache or from the same query already running.
+        Argument(s):
+            - key { tuple } - Key of the query, with the connection and the command line.
+        Output(s):
+            - future { Future class } - Future of the result of the query.
+            - is_owner { bool } - True if the caller must run the query and call complete().
+        """
+
+        with self.lock:
+
+            # Wait for the same query if it is already running
+            if key in self.pending.keys():
+                return self.pending[key][1], False
+
+            # Use a recent result
+            future = Future()
+            if key in self.results.keys() and time.time() - self.results[key][0] <= self.lifetime:
+                future.set_result( self.results[key][1] )
+                return future, False
+
+            # Run the query
+            self.pending[key] = (time.time(), future)
+
+        return future, True
+
+    # ----------------------------------------------
+    # Share the result of a query with all its callers
+    def complete(self, key, result=None, error=None):
+
+        """ Save the result of a query claimed with claim().
+        Argument(s):
+            - key { tuple } - Key of the query.
+            - result { object } - (Opt.) Result of the query.
+                                  Default is None.
+            - error { Exception } - (Opt.) Error raised by the query, if it failed.
+                                    Default is None.
+        """
+
+        with self.lock:
+            start_time, future = self.pending.pop(key)
+
+            # Forget the results that are too old
+            current_time = time.time()
+            self.results = {x:y for x, y in self.results.items() if current_time - y[0] <= self.lifetime}
+
+            # Keep the result, with the time the query started
+            if error is None and self.lifetime > 0:
+                self.results[key] = (start_time, result)
+
+        # Answer all the callers
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    # -------------------------
+    # Forget all the results
+    def invalidate(self):
+        with self.lock:
+            self.results = {}
+
+# Initialise the cache of the job lists
+_query_cache = QueryCache()
+
 ##-\-\-\-\-\-\-\-\
 ## PUBLIC FUNCTIONS
 ##-/-/-/-/-/-/-/-/
 
 # ---------------------
 # Retrieve the job list
-def getJobList(server, command='squeue -o %all -u', username=None, selection=None, column_name='WORK_DIR'):
+def getJobList(server, command='squeue -o %all -u', username=None, selection=None, column_name='WORK_DIR', columns=None, timeout=None, remote_filter=None):
 
     """ Get the list of the job submitted and/or running.
     Argument(s):
@@ -61,22 +363,144 @@ def getJobList(server, command='squeue -o %all -u', username=None, selection=Non
                                             Default is None (no selection).
         - column_name { str } - (Opt.) Name of the column to read the path from to sort the columns.
                                 Default is WORK_DIR
+        - columns { list of str } - (Opt.) Names of the columns to retrieve from the server. Only used with squeue -o %all.
+                                    Default is None (all the columns).
+        - timeout { float } - (Opt.) Time in seconds after which the server is considered to hang.
+                              Default is None (no limit).
+        - remote_filter { str } - (Opt.) Command filtering the job list on the server, added after the command with a pipe.
+                                  Default is None (use the path conditions of the selection, if any can be checked on the server).
     Output(s):
         - job_df { pandas DataFrame } - Table with all the jobs and their properties.
     """
 
+    # Keep the column used for the selection
+    if columns is not None and selection is not None:
+        columns = list(columns) + [column_name]
+
+    # Only download the jobs that can be selected
+    remote_filter = _get_remote_filter(selection=selection, column_name=column_name, remote_filter=remote_filter)
+
     # Get the information from the server
-    raw_joblist = _get_on_server(server, command=command, username=username)
-    raw_joblist = raw_joblist[0]
+    job_df = _get_on_server(server, command=command, username=username, columns=columns, timeout=timeout, remote_filter=remote_filter)
 
-    # Convert the job list in a pandas dataframe
-    job_df = _list2df(raw_joblist)
+    return _select_jobs(job_df, selection=selection, column_name=column_name)
 
-    # Return only the selected columns if required
-    if selection is not None:
-        job_df = getSelection(job_df, selection, column_name=column_name)
+# ------------------------------------------------
+# Retrieve several job lists in a single query
+def getJobLists(server, queries, timeout=None, return_errors=False):
 
-    return job_df
+    """ Get several lists of jobs from the same server in a single round trip.
+    Argument(s):
+        - server { Server class } - Instance of the server class to send the commands to.
+        - queries { list of dict } - Settings of each list of jobs, with the same keywords as getJobList() (command, username, selection, column_name, columns, remote_filter).
+        - timeout { float } - (Opt.) Time in seconds after which the server is considered to hang.
+                              Default is None (no limit).
+        - return_errors { bool } - (Opt.) Return the error of a query that failed in its place in the list, instead of raising it.
+                                   The errors of the connection are always raised. Default is False.
+    Output(s):
+        - job_dfs { list of pandas DataFrame } - Tables of the jobs, in the same order as the queries.
+    """
+
+    # Prepare the command lines
+    all_commands = []
+    for query in queries:
+
+        # Keep the column used for the selection
+        columns = query.get('columns')
+        if columns is not None and query.get('selection') is not None:
+            columns = list(columns) + [query.get('column_name', 'WORK_DIR')]
+
+        # Only download the jobs that can be selected
+        remote_filter = _get_remote_filter(selection=query.get('selection'), column_name=query.get('column_name', 'WORK_DIR'), remote_filter=query.get('remote_filter'))
+
+        all_commands.append( _full_command(server, command=query.get('command', 'squeue -o %all -u'), username=query.get('username'), columns=columns, remote_filter=remote_filter) )
+
+    # Share the queries with the other callers asking for the same lists
+    all_keys = [(connectionKey(server), x) for x in all_commands]
+    all_claims = [_query_cache.claim(x) for x in all_keys]
+    owned_ids = [i for i, (_, is_owner) in enumerate(all_claims) if is_owner]
+
+    # Send all the remaining commands at once
+    if len(owned_ids) != 0:
+        try:
+            sent_job_dfs = sendCommands(server, *[all_commands[i] for i in owned_ids], output=True, timeout=timeout, batch=True, parser=JobListParser)
+        except BaseException as error:
+            for i in owned_ids:
+                _query_cache.complete(all_keys[i], error=error)
+            raise
+        for i, job_df in zip(owned_ids, sent_job_dfs):
+
+            # Do not keep the commands that failed on the server
+            if isinstance(job_df, Exception):
+                _query_cache.complete(all_keys[i], error=job_df)
+            else:
+                _query_cache.complete(all_keys[i], result=job_df)
+
+    # Select the jobs of each list
+    job_dfs = []
+    for query, (future, _) in zip(queries, all_claims):
+
+        # Keep the error of the query if requested
+        error = future.exception()
+        if error is not None:
+            if not return_errors:
+                raise error
+            job_dfs.append(error)
+            continue
+
+        job_dfs.append( _select_jobs(future.result(), selection=query.get('selection'), column_name=query.get('column_name', 'WORK_DIR')) )
+
+    return job_dfs
+
+# ------------------------------------------
+# Get the jobs that changed between two lists
+def diffJobLists(old_df, new_df, key_column='JOBID'):
+
+    """ Compare two job lists and get the jobs inserted, deleted and updated.
+    Argument(s):
+        - old_df { pandas DataFrame } - Previous table of the jobs.
+        - new_df { pandas DataFrame } - New table of the jobs.
+        - key_column { str } - (Opt.) Name of the column identifying the jobs. The values must be unique in both tables.
+                               Default is JOBID.
+    Output(s):
+        - inserted { list of str } - Keys of the jobs only in the new table, in the order of the new table.
+        - deleted { list of str } - Keys of the jobs only in the previous table.
+        - updated { list of str } - Keys of the jobs in both tables with at least one different value.
+    """
+
+    # Get the keys of the jobs as strings
+    old_keys = pd.Index(old_df[key_column].astype(str))
+    new_keys = pd.Index(new_df[key_column].astype(str))
+
+    # Check that the keys can be used
+    if not old_keys.is_unique or not new_keys.is_unique:
+        raise ValueError("The values of the column "+key_column+" are not unique.")
+
+    # Get the jobs inserted and deleted
+    inserted = list( new_keys[~new_keys.isin(old_keys)] )
+    deleted = list( old_keys[~old_keys.isin(new_keys)] )
+
+    # Compare the values of the jobs in both tables
+    common_keys = new_keys[new_keys.isin(old_keys)]
+    common_columns = [x for x in new_df.columns if x in old_df.columns]
+
+    old_values = old_df[common_columns].set_axis(old_keys, axis=0).loc[common_keys]
+    new_values = new_df[common_columns].set_axis(new_keys, axis=0).loc[common_keys]
+
+    # Two missing values are the same, e.g. the start time of a pending job
+    is_updated = np.zeros(len(common_keys), dtype=bool)
+    for column_name in common_columns:
+        old_column, new_column = old_values[column_name], new_values[column_name]
+        is_missing = old_column.isna().values & new_column.isna().values
+        try:
+            is_different = (old_column != new_column).fillna(True).to_numpy(dtype=bool)
+        except TypeError:
+            is_different = (old_column.astype(str) != new_column.astype(str)).to_numpy(dtype=bool)
+        is_updated |= is_different & ~is_missing
+
+    updated = list( common_keys[is_updated] )
+
+    return inserted, deleted, updated
 
 # ----------------------
 # Kill the selected jobs
@@ -96,3 +520,18 @@ def killJobs(server, *job_ids, command='scancel'):
 
     # Kill all the selected jobs
     sendCommands(server, command, output=False)
+
+    # Read the job lists again on the next calls
+    _query_cache.invalidate()
+
+# -------------------------------------------
+# Set how long the job lists can be reused
+def setQueryLifetime(lifetime):
+
+    """ Set how long a job list can be returned again to the calls asking for the same list. The calls made while the same list is being retrieved always share its result.
+    Argument(s):
+        - lifetime { float } - Time in seconds during which a job list is reused. Use 0 to always query the server.
+    """
+
+    _query_cache.lifetime = lifetime
+    _query_cache.invalidate()
@@ -0,0 +1,364 @@
+from appdirs import AppDirs
+import os
+import pandas as pd
+import threading
+import time
+
+from get_jobs import diffJobLists
+
+# Name of the column storing the type of each change
+_CHANGE_COLUMN = '_change'
+
+# Name of the column storing the time of each change
+_TIME_COLUMN = '_time'
+
+##-\-\-\-\-\-\-\-\-\-\
+## HISTORY STORE CLASS
+##-/-/-/-/-/-/-/-/-/-/
+
+# Define the history of the job lists of a server
+class HistoryStore:
+    def __init__(self, folder, key_column='JOBID', keyframe_interval=200, max_days=30):
+
+        # Get the settings of the store
+        self.folder = folder
+        self.key_column = key_column
+        self.keyframe_interval = keyframe_interval
+        self.max_days = max_days
+
+        # Initialise the last state of the job list
+        self.state = None
+        self.n_deltas = 0
+        self.n_files = 0
+        self.lock = threading.Lock()
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## SAVE THE SNAPSHOTS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ---------------------------------------------------
+    # Save the changes in the job list since the last one
+    def append(self, job_df, timestamp=None):
+
+        """ Save a new job list in the history, as the changes since the previous one.
+        Argument(s):
+            - job_df { pandas DataFrame } - Table with all the jobs and their properties.
+            - timestamp { float } - (Opt.) Time of the job list, in seconds since the epoch.
+                                    Default is None (current time).
+        Output(s):
+            - n_changes { int } - Number of jobs saved in the snapshot.
+        """
+
+        # Get the time of the snapshot
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+
+            # Get the previous job list
+            if self.state is None:
+                self.state, self.n_deltas = self._load_state()
+
+            # Save the whole list from time to time, or if it brings new columns
+            if self.state is None or self.n_deltas >= self.keyframe_interval or not set(job_df.columns).issubset(self.state.columns):
+                snapshot_df = job_df.assign( **{_CHANGE_COLUMN:'full'} )
+                self._write(snapshot_df, timestamp, keyframe=True)
+                self.state = job_df.reset_index(drop=True)
+                self.n_deltas = 0
+
+                # Forget the snapshots that are too old, now that a new full list is saved
+                self._prune(timestamp)
+                return len(snapshot_df)
+
+            # Only save the jobs that changed
+            snapshot_df = _make_delta(self.state, job_df, key_column=self.key_column)
+            if len(snapshot_df) == 0:
+                return 0
+
+            self._write(snapshot_df, timestamp, keyframe=False)
+            self.n_deltas += 1
+
+            # Update the last state
+            if set(job_df.columns) == set(self.state.columns):
+                self.state = job_df.reset_index(drop=True)
+            else:
+                self.state = _apply_delta(self.state, snapshot_df, key_column=self.key_column)
+
+        return len(snapshot_df)
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## READ THE SNAPSHOTS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ----------------------------------------
+    # Rebuild the job list at a given time
+    def load(self, timestamp=None):
+
+        """ Rebuild the job list from the history.
+        Argument(s):
+            - timestamp { float } - (Opt.) Time of the job list to rebuild, in seconds since the epoch.
+                                    Default is None (last job list saved).
+        Output(s):
+            - job_df { pandas DataFrame } - Table with the jobs and their properties at that time, None if there is no history.
+        """
+
+        with self.lock:
+            job_df, _ = self._load_state(timestamp=timestamp)
+
+        return job_df
+
+    # ----------------------------------
+    # Get all the changes of a single job
+    def jobHistory(self, job_id):
+
+        """ Get all the saved changes of a job.
+        Argument(s):
+            - job_id { int or str } - Value of the job in the key column.
+        Output(s):
+            - history_df { pandas DataFrame } - Table with one row per change of the job, with the time of the change (_time) and its type (_change).
+        """
+
+        # Read the rows of the job in all the snapshots
+        all_rows = []
+        with self.lock:
+            for timestamp, file_path in self._list_files():
+                snapshot_df = pd.read_feather(file_path)
+                job_rows = snapshot_df[ snapshot_df[self.key_column].astype(str) == str(job_id) ]
+                if len(job_rows) != 0:
+                    all_rows.append( job_rows.assign( **{_TIME_COLUMN:pd.to_datetime(timestamp, unit='ms')} ) )
+
+        # Return an empty table if the job is unknown
+        if len(all_rows) == 0:
+            return pd.DataFrame(columns=[_TIME_COLUMN, _CHANGE_COLUMN, self.key_column])
+
+        # Put the time and the type of change first
+        history_df = pd.concat(all_rows, ignore_index=True)
+        first_columns = [_TIME_COLUMN, _CHANGE_COLUMN]
+
+        return history_df[ first_columns + [x for x in history_df.columns if x not in first_columns] ]
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ----------------------------------------------
+    # Get all the snapshots saved, in the time order
+    def _list_files(self):
+
+        # Nothing saved yet
+        if not os.path.isdir(self.folder):
+            return []
+
+        # Read the snapshots of all the days, named after their time and their number
+        all_files = []
+        for day_folder in os.listdir(self.folder):
+            day_path = os.path.join(self.folder, day_folder)
+            if os.path.isdir(day_path):
+                for file_name in os.listdir(day_path):
+                    if file_name.endswith('.feather'):
+                        file_time, _, file_id = file_name.split('.')[0].partition('-')
+                        all_files.append( (int(file_time), int(file_id or 0), os.path.join(day_path, file_name)) )
+
+        return [(x[0], x[2]) for x in sorted(all_files)]
+
+    # -----------------------------------------
+    # Rebuild the job list from the snapshots
+    def _load_state(self, timestamp=None):
+
+        # Get the snapshots to read
+        all_files = self._list_files()
+        if timestamp is not None:
+            all_files = [x for x in all_files if x[0] <= int(timestamp * 1000)]
+
+        # Start from the last full job list
+        keyframes = [i for i, (_, file_path) in enumerate(all_files) if file_path.endswith('.full.feather')]
+        if len(keyframes) == 0:
+            return None, 0
+
+        # Apply all the changes since then
+        state = None
+        for _, file_path in all_files[keyframes[-1]:]:
+            state = _apply_delta(state, pd.read_feather(file_path), key_column=self.key_column)
+
+        return state, len(all_files) - keyframes[-1] - 1
+
+    # --------------------------
+    # Write a snapshot on disk
+    def _write(self, snapshot_df, timestamp, keyframe=False):
+
+        # Store the snapshots of each day in a different folder
+        day_path = os.path.join(self.folder, time.strftime('%Y-%m-%d', time.localtime(timestamp)))
+        if not os.path.isdir(day_path):
+            os.makedirs(day_path)
+
+        # Name the file after the time of the snapshot, with a number for the snapshots of the same time
+        while True:
+            file_name = str(int(timestamp * 1000)) + '-' + str(self.n_files)
+            self.n_files += 1
+            if keyframe:
+                file_name += '.full'
+            file_path = os.path.join(day_path, file_name + '.feather')
+            if not os.path.exists(file_path):
+                break
+
+        # Save the file
+        snapshot_df.reset_index(drop=True).to_feather(file_path)
+
+    # -------------------------------------------------
+    # Remove the snapshots older than the retention time
+    def _prune(self, timestamp):
+
+        # Keep everything if there is no limit
+        if self.max_days is None:
+            return 0
+
+        # Keep the last full job list before the limit, the changes after it need it
+        all_files = self._list_files()
+        limit_time = int((timestamp - self.max_days * 86400) * 1000)
+        keyframes = [i for i, (file_time, file_path) in enumerate(all_files) if file_time <= limit_time and file_path.endswith('.full.feather')]
+        if len(keyframes) == 0:
+            return 0
+
+        # Remove the older snapshots
+        for _, file_path in all_files[:keyframes[-1]]:
+            os.remove(file_path)
+
+        # Remove the folders of the days left empty
+        for day_folder in os.listdir(self.folder):
+            day_path = os.path.join(self.folder, day_folder)
+            if os.path.isdir(day_path) and len(os.listdir(day_path)) == 0:
+                os.rmdir(day_path)
+
+        return keyframes[-1]
+
+# Initialise the stores of all the servers
+_history_stores = {}
+_stores_lock = threading.Lock()
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ----------------------------------------
+# Return the folder of the job history
+def _return_history_folder():
+
+    # Search the default directory of the system
+    default_directory = AppDirs('HPyMon', 'history', version="1.0")
+    default_directory = default_directory.user_data_dir
+
+    return os.path.join(default_directory, 'history')
+
+# -------------------------------------------
+# Get the store of the history of a server
+def _get_store(server_name, key_column='JOBID'):
+
+    with _stores_lock:
+        if server_name not in _history_stores.keys():
+            _history_stores[server_name] = HistoryStore(os.path.join(_return_history_folder(), server_name), key_column=key_column)
+
+    return _history_stores[server_name]
+
+# ------------------------------------------------------
+# Get the jobs that changed since the previous job list
+def _make_delta(old_df, new_df, key_column='JOBID'):
+
+    # Compare the two lists
+    inserted, deleted, updated = diffJobLists(old_df, new_df, key_column=key_column)
+
+    # Save the new values of the inserted and updated jobs
+    new_keys = new_df[key_column].astype(str)
+    set_df = new_df[ new_keys.isin(set(inserted) | set(updated)).values ]
+
+    # Save the last values of the deleted jobs
+    old_keys = old_df[key_column].astype(str)
+    deleted_df = old_df.loc[ old_keys.isin(set(deleted)).values, list(new_df.columns) ]
+
+    # Mark the type of each change
+    delta_df = pd.concat([set_df.assign( **{_CHANGE_COLUMN:'set'} ), deleted_df.assign( **{_CHANGE_COLUMN:'del'} )], ignore_index=True)
+
+    return delta_df
+
+# -------------------------------------------
+# Apply the changes of a snapshot to a job list
+def _apply_delta(state_df, delta_df, key_column='JOBID'):
+
+    # Replace the job list with a full snapshot
+    changes = delta_df[_CHANGE_COLUMN]
+    if state_df is None or (changes == 'full').any():
+        return delta_df[changes == 'full'].drop(columns=_CHANGE_COLUMN).reset_index(drop=True)
+
+    # Index both tables on the job keys
+    set_df = delta_df[changes == 'set'].drop(columns=_CHANGE_COLUMN)
+    set_df.index = set_df[key_column].astype(str)
+    state_df = state_df.set_index(state_df[key_column].astype(str))
+
+    # Complete the updated jobs with the columns missing from the snapshot
+    updated_df = set_df[set_df.index.isin(state_df.index)]
+    missing_columns = [x for x in state_df.columns if x not in set_df.columns]
+    if len(missing_columns) != 0:
+        updated_df = updated_df.join(state_df[missing_columns])
+
+    # Keep the jobs that did not change
+    changed = set( delta_df[key_column].astype(str) )
+    unchanged_df = state_df[ ~state_df.index.isin(changed) ]
+
+    # Add the updated and the new jobs at the end
+    state_df = pd.concat([unchanged_df, updated_df, set_df[~set_df.index.isin(state_df.index)]])
+
+    return state_df.reset_index(drop=True)
+
+##-\-\-\-\-\-\-\-\
+## PUBLIC FUNCTIONS
+##-/-/-/-/-/-/-/-/
+
+# --------------------------------------
+# Save a job list in the history
+def saveSnapshot(server_name, job_df, key_column='JOBID', timestamp=None):
+
+    """ Save a job list in the history of the server. Only the jobs that changed since the previous job list are written on disk.
+    Argument(s):
+        - server_name { str } - Name of the server the job list comes from.
+        - job_df { pandas DataFrame } - Table with all the jobs and their properties.
+        - key_column { str } - (Opt.) Name of the column identifying the jobs.
+                               Default is JOBID.
+        - timestamp { float } - (Opt.) Time of the job list, in seconds since the epoch.
+                                Default is None (current time).
+    Output(s):
+        - n_changes { int } - Number of jobs saved in the snapshot.
+    """
+
+    return _get_store(server_name, key_column=key_column).append(job_df, timestamp=timestamp)
+
+# ------------------------------------------
+# Rebuild a job list from the history
+def loadSnapshot(server_name, timestamp=None, key_column='JOBID'):
+
+    """ Rebuild the job list of a server from its history.
+    Argument(s):
+        - server_name { str } - Name of the server.
+        - timestamp { float } - (Opt.) Time of the job list to rebuild, in seconds since the epoch.
+                                Default is None (last job list saved).
+        - key_column { str } - (Opt.) Name of the column identifying the jobs.
+                               Default is JOBID.
+    Output(s):
+        - job_df { pandas DataFrame } - Table with the jobs and their properties at that time, None if there is no history.
+    """
+
+    return _get_store(server_name, key_column=key_column).load(timestamp=timestamp)
+
+# ------------------------------------------
+# Get all the changes of a job
+def getJobHistory(server_name, job_id, key_column='JOBID'):
+
+    """ Get all the changes of a job saved in the history of a server, e.g. to find when it started.
+    Argument(s):
+        - server_name { str } - Name of the server.
+        - job_id { int or str } - Value of the job in the key column.
+        - key_column { str } - (Opt.) Name of the column identifying the jobs.
+                               Default is JOBID.
+    Output(s):
+        - history_df { pandas DataFrame } - Table with one row per change of the job, with the time of the change (_time) and its type (set, del or full in _change).
+    """
+
+    return _get_store(server_name, key_column=key_column).jobHistory(job_id)
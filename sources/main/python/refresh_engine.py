@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
+
+from get_jobs import getJobList, getJobLists
+from ssh_protocol import openServer
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# ------------------------------------------
+# Open a server and fetch its first job list
+def _open_and_fetch(server_name, timeout=None):
+
+    # Get the server
+    opened_server = openServer(server_name, use_name=True)
+
+    # Get the first job list, which also checks the connection
+    job_df = getJobList(opened_server, command=opened_server.get_jobs, username=opened_server.queryname, timeout=timeout)
+
+    return opened_server, job_df
+
+##-\-\-\-\-\-\-\-\-\-\
+## REFRESH ENGINE CLASS
+##-/-/-/-/-/-/-/-/-/-/
+
+class RefreshEngine:
+    def __init__(self, max_workers=16, timeout=60):
+
+        # Get the settings of the engine
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        # Initialise the pool of workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## SUBMIT THE QUERIES
+    ##-/-/-/-/-/-/-/-/-/
+
+    # -------------------------------------------
+    # Run a function in the pool of workers
+    def submit(self, function, *args, **kwargs):
+        return self.executor.submit(function, *args, **kwargs)
+
+    # ------------------------------------------
+    # Fetch the job list of a server in the pool
+    def fetchJobList(self, server, **kwargs):
+
+        # Use the timeout of the engine by default
+        if 'timeout' not in kwargs.keys():
+            kwargs['timeout'] = self.timeout
+
+        return self.submit(getJobList, server, command=server.get_jobs, username=server.queryname, **kwargs)
+
+    # ------------------------------------------------------
+    # Fetch several job lists of a server in a single query
+    def fetchJobLists(self, server, queries, **kwargs):
+
+        # Use the timeout of the engine by default
+        if 'timeout' not in kwargs.keys():
+            kwargs['timeout'] = self.timeout
+
+        return self.submit(getJobLists, server, queries, **kwargs)
+
+    # ---------------------------------------------------
+    # Open a server and fetch its job list in the pool
+    def connectServer(self, server_name):
+        return self.submit(_open_and_fetch, server_name, timeout=self.timeout)
+
+    ##-\-\-\-\-\-\-\-\-\-\
+    ## COLLECT THE RESULTS
+    ##-/-/-/-/-/-/-/-/-/-/
+
+    # -----------------------------------------
+    # Return the results as soon as they arrive
+    def iterResults(self, futures, wait_function=None, poll_time=0.1):
+
+        """ Yield the results of the submitted queries in their completion order.
+        Argument(s):
+            - futures { dict } - Dictionary of the futures to wait for, with the key to return for each of them.
+            - wait_function { function } - (Opt.) Function to call while waiting for the results.
+                                           Default is None.
+            - poll_time { float } - (Opt.) Time in seconds between two calls of the wait function.
+                                    Default is 0.1.
+        Output(s):
+            - key { object } - Key associated to the future.
+            - result { object } - Result of the query, None if the query failed.
+            - error { Exception } - Error raised by the query, None if the query succeeded.
+        """
+
+        pending = set(futures.keys())
+        while len(pending) != 0:
+
+            # Wait for the next results
+            done, pending = wait(pending, timeout=poll_time, return_when=FIRST_COMPLETED)
+
+            # Return the completed queries
+            for future in done:
+                self._forget(future)
+                error = future.exception()
+                if error is None:
+                    yield futures[future], future.result(), None
+                else:
+                    yield futures[future], None, error
+
+            # Give up on the queries hanging for too long
+            for future in self._get_expired(pending):
+                pending.remove(future)
+                self._forget(future)
+                yield futures[future], None, TimeoutError("No answer after "+str(self._expiry_time())+" seconds.")
+
+            # Let the caller work in the meantime
+            if wait_function is not None:
+                wait_function()
+
+    # ---------------------------
+    # Stop the pool of workers
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ------------------------------------------------------------
+    # Get the time after which a query is given up, in seconds
+    def _expiry_time(self):
+
+        # Leave a margin for the connection, which has its own timeout
+        return 2 * self.timeout
+
+    # ---------------------------------------
+    # Get the futures running for too long
+    def _get_expired(self, pending):
+
+        # Get the time limit
+        if self.timeout is None:
+            return []
+        time_limit = time.time() - self._expiry_time()
+
+        # Get the futures that started running before the limit
+        expired = []
+        for future in pending:
+            start_time = getattr(future, 'start_time', None)
+            if start_time is None and future.running():
+                future.start_time = time.time()
+            elif start_time is not None and start_time < time_limit:
+                expired.append(future)
+
+        return expired
+
+    # ----------------------------
+    # Stop tracking the future
+    def _forget(self, future):
+        if hasattr(future, 'start_time'):
+            del future.start_time
@@ -0,0 +1,255 @@
+import random
+import re
+import threading
+import time
+
+##-\-\-\-\-\-\-\-\-\
+## PRIVATE FUNCTIONS
+##-/-/-/-/-/-/-/-/-/
+
+# --------------------------------------------
+# Convert a duration of squeue in seconds
+def _time2seconds(duration):
+
+    # Read the format [days-][hours:]minutes:seconds
+    match = re.match(r'^(?:(\d+)-)?(?:(\d+):)?(\d+):(\d+)$', str(duration).strip())
+    if match is None:
+        return None
+
+    days, hours, minutes, seconds = [int(x) if x is not None else 0 for x in match.groups()]
+
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+# ------------------------------------------
+# Get the state of all the jobs in the queue
+def _queue_state(job_df, key_column='JOBID', state_column='STATE'):
+
+    # Without the keys, only the size of the queue can be compared
+    if key_column not in job_df.columns:
+        return len(job_df)
+
+    # Compare the states if they are available
+    if state_column not in job_df.columns:
+        return frozenset( job_df[key_column].astype(str) )
+
+    return frozenset( zip(job_df[key_column].astype(str), job_df[state_column].astype(str)) )
+
+# ----------------------------------------------------
+# Check if some jobs reach their time limit very soon
+def _jobs_ending_soon(job_df, time_limit, time_column='TIME_LEFT', state_column='STATE'):
+
+    # Ignore the job lists without the remaining time
+    if time_column not in job_df.columns:
+        return False
+
+    # Only the running jobs get closer to their limit
+    if state_column in job_df.columns:
+        job_df = job_df[ job_df[state_column].astype(str) == 'RUNNING' ]
+
+    # Read the remaining times of the jobs
+    for duration in job_df[time_column].unique():
+        seconds = _time2seconds(duration)
+        if seconds is not None and seconds <= time_limit:
+            return True
+
+    return False
+
+##-\-\-\-\-\-\-\-\-\-\-\-\
+## REFRESH SCHEDULER CLASS
+##-/-/-/-/-/-/-/-/-/-/-/-/
+
+class RefreshScheduler:
+    def __init__(self, refresh_time=1800, min_factor=0.25, max_factor=4, idle_cycles=3, backoff=2, jitter=0.1):
+
+        # Get the settings of the scheduler
+        self.refresh_time = refresh_time
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.idle_cycles = idle_cycles
+        self.backoff = backoff
+        self.jitter = jitter
+
+        # Initialise the schedules of the servers
+        self.schedules = {}
+        self.lock = threading.Lock()
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## RECORD THE QUERIES
+    ##-/-/-/-/-/-/-/-/-/
+
+    # -------------------------------------------------
+    # Get the time before the next refresh of a server
+    def recordResult(self, server_name, job_df):
+
+        """ Update the refresh interval of a server after a new job list.
+        Argument(s):
+            - server_name { str } - Name of the server.
+            - job_df { pandas DataFrame } - Table with all the jobs and their properties.
+        Output(s):
+            - delay { float } - Time in seconds before the next refresh of the server.
+        """
+
+        with self.lock:
+            schedule = self._get_schedule(server_name)
+
+            # Check the activity in the queue
+            queue_state = _queue_state(job_df)
+            is_changing = schedule['state'] is not None and queue_state != schedule['state']
+            is_ending = _jobs_ending_soon(job_df, self.refresh_time)
+            schedule['state'] = queue_state
+            schedule['n_failed'] = 0
+
+            # Refresh faster while the jobs are changing
+            if is_changing or is_ending:
+                schedule['n_idle'] = 0
+                schedule['interval'] = self.refresh_time * self.min_factor
+
+            # Slow down progressively when nothing happens
+            else:
+                schedule['n_idle'] += 1
+                if schedule['n_idle'] >= self.idle_cycles:
+                    max_interval = self.refresh_time * self.max_factor
+                else:
+                    max_interval = self.refresh_time
+                schedule['interval'] = min(schedule['interval'] * self.backoff, max_interval)
+
+            return self._plan(schedule)
+
+    # -------------------------------------------------------
+    # Get the time before the next try on a failed server
+    def recordFailure(self, server_name):
+
+        """ Update the refresh interval of a server after a failed query.
+        Argument(s):
+            - server_name { str } - Name of the server.
+        Output(s):
+            - delay { float } - Time in seconds before the next refresh of the server.
+        """
+
+        with self.lock:
+            schedule = self._get_schedule(server_name)
+
+            # Wait longer after each failure
+            schedule['n_failed'] += 1
+            schedule['interval'] = min(schedule['interval'] * self.backoff, self.refresh_time * self.max_factor)
+
+            return self._plan(schedule)
+
+    # --------------------------------------------------
+    # Plan the next refresh of a server with its interval
+    def planRefresh(self, server_name):
+
+        """ Plan the next refresh of a server without any new information, e.g. for its first refresh.
+        Argument(s):
+            - server_name { str } - Name of the server.
+        Output(s):
+            - delay { float } - Time in seconds before the next refresh of the server.
+        """
+
+        with self.lock:
+            return self._plan( self._get_schedule(server_name) )
+
+    ##-\-\-\-\-\-\-\-\-\-\-\
+    ## READ THE SCHEDULES
+    ##-/-/-/-/-/-/-/-/-/-/-/
+
+    # --------------------------------------
+    # Get the servers that must be refreshed
+    def dueServers(self, server_names=None):
+
+        """ Get the servers with a refresh due.
+        Argument(s):
+            - server_names { list of str } - (Opt.) Names of the servers to check. The unknown servers are due immediately.
+                                             Default is None (all the servers of the scheduler).
+        Output(s):
+            - due_servers { list of str } - Names of the servers to refresh.
+        """
+
+        with self.lock:
+
+            # Check all the servers
+            if server_names is None:
+                server_names = list(self.schedules.keys())
+
+            current_time = time.time()
+            return [x for x in server_names if x not in self.schedules.keys() or self.schedules[x]['next_time'] <= current_time]
+
+    # ---------------------------------------------
+    # Get the time before the next refresh is due
+    def nextDelay(self, server_names=None):
+
+        """ Get the time before the next refresh of any server.
+        Argument(s):
+            - server_names { list of str } - (Opt.) Names of the servers to check.
+                                             Default is None (all the servers of the scheduler).
+        Output(s):
+            - delay { float } - Time in seconds before the next refresh, None if there is no server.
+        """
+
+        with self.lock:
+
+            # Check all the servers
+            if server_names is None:
+                server_names = list(self.schedules.keys())
+            if len(server_names) == 0:
+                return None
+
+            # Refresh the unknown servers immediately
+            if any(x not in self.schedules.keys() for x in server_names):
+                return 0
+
+            return max(0, min(self.schedules[x]['next_time'] for x in server_names) - time.time())
+
+    ##-\-\-\-\-\-\-\-\-\-\-\
+    ## EDIT THE SCHEDULES
+    ##-/-/-/-/-/-/-/-/-/-/-/
+
+    # -------------------------------
+    # Change the basic refresh time
+    def setRefreshTime(self, refresh_time):
+
+        """ Change the refresh interval used when the jobs change at a normal pace.
+        Argument(s):
+            - refresh_time { float } - Time in seconds between two refreshes.
+        """
+
+        with self.lock:
+
+            # Keep the schedules if the time did not change
+            if refresh_time == self.refresh_time:
+                return 0
+            self.refresh_time = refresh_time
+
+            # Restart all the servers from the new time
+            for schedule in self.schedules.values():
+                schedule['interval'] = refresh_time
+
+    # ---------------------------------
+    # Forget the schedule of a server
+    def remove(self, server_name):
+        with self.lock:
+            self.schedules.pop(server_name, None)
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # ------------------------------------
+    # Get the schedule of a server
+    def _get_schedule(self, server_name):
+
+        # Create the schedule of a new server
+        if server_name not in self.schedules.keys():
+            self.schedules[server_name] = {'interval':self.refresh_time, 'next_time':0, 'state':None, 'n_idle':0, 'n_failed':0}
+
+        return self.schedules[server_name]
+
+    # ------------------------------------
+    # Plan the next refresh of a server
+    def _plan(self, schedule):
+
+        # Do not refresh all the servers at the same time
+        delay = schedule['interval'] * random.uniform(1 - self.jitter, 1 + self.jitter)
+        schedule['next_time'] = time.time() + delay
+
+        return delay
@@ -1,6 +1,15 @@
+from collections import OrderedDict
+import numpy as np
 import os
 import pandas as pd
+import posixpath
 import re
+import threading
+
+from settings import getConfigVersion, loadDisplay
+
+# Characters that cannot be written in the filter sent to the server
+_UNSAFE_CHARACTERS = re.compile('[\'"\\\\\n\r]')
 
 ##-\-\-\-\-\-\-\-\
 ## SELECTION CLASS
@@ -48,6 +57,16 @@ class Selection:
 
         return jobs_dict
 
+    # --------------------------------------------------------
+    # Get the command filtering the job list on the server
+    def remoteFilter(self):
+
+        # Only the paths split on the slashes can be read on the server
+        if not self.use_path:
+            return None
+
+        return _remote_path_filter(self.conditions, column_name=self.column)
+
 ##-\-\-\-\-\-\-\
 ## DISPLAY CLASS
 ##-/-/-/-/-/-/-/
@@ -68,6 +87,43 @@ class CustomDisplay:
         # Settings for the custom display
         self.selection = selection_class
 
+        # Results of the selection for the last job lists
+        self.results = OrderedDict()
+
+    # ----------------------------------------------------
+    # Select and sort the jobs, reusing the previous results
+    def selectedJobs(self, job_df, data_version=None, max_results=8):
+
+        """ Apply the selection of the display to a job list.
+        Argument(s):
+            - job_df { pandas DataFrame } - Table with all the jobs and their properties.
+            - data_version { object } - (Opt.) Version of the job list. The result is kept for the next calls with the same version.
+                                        Default is None (always apply the selection).
+            - max_results { int } - (Opt.) Number of versions to keep the results of.
+                                    Default is 8.
+        Output(s):
+            - job_list { pandas DataFrame or dict } - Selected jobs, sorted in a dictionary if the selection sorts them.
+        """
+
+        # Reuse the result of the same job list
+        if data_version is not None and data_version in self.results.keys():
+            self.results.move_to_end(data_version)
+            return self.results[data_version]
+
+        # Make the job selection
+        if len(self.selection.sorting['columns']) != 0:
+            job_list = self.selection.sortJobs(job_df)
+        else:
+            job_list = self.selection.selectJobs(job_df)
+
+        # Keep the result for the last versions only
+        if data_version is not None:
+            self.results[data_version] = job_list
+            while len(self.results) > max_results:
+                self.results.popitem(last=False)
+
+        return job_list
+
     # ------------------------------------
     # Load the column names from the input
     def _load_column_names(self, column_names):
@@ -80,6 +136,113 @@ class CustomDisplay:
         else:
             self.columns = re.findall("\'(.+?)\'", column_names)
 
+##-\-\-\-\-\-\-\-\-\-\
+## PATH CACHE CLASS
+##-/-/-/-/-/-/-/-/-/-/
+
+class PathCache:
+    def __init__(self, max_size=100000):
+
+        # Settings of the cache
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        # Initialise the content of the cache
+        self.elements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------------------------------
+    # Get the elements of the paths in memory
+    def getMany(self, all_paths, use_path=True, separator=''):
+
+        with self.lock:
+
+            # Read the paths already split
+            all_elements = []
+            missing_paths = []
+            for path in all_paths:
+                key = (path, use_path, separator)
+                elements = self.elements.get(key)
+
+                # Mark the path as recently used
+                if elements is not None:
+                    self.elements.move_to_end(key)
+                else:
+                    missing_paths.append(path)
+                all_elements.append(elements)
+
+            # Update the counters
+            self.misses += len(missing_paths)
+            self.hits += len(all_elements) - len(missing_paths)
+
+        return all_elements, missing_paths
+
+    # -------------------------------------
+    # Save the elements of the paths split
+    def putMany(self, all_paths, all_elements, use_path=True, separator=''):
+
+        with self.lock:
+
+            # Add the new paths
+            for path, elements in zip(all_paths, all_elements):
+                self.elements[(path, use_path, separator)] = elements
+
+            # Remove the paths not used for the longest time
+            while len(self.elements) > self.max_size:
+                self.elements.popitem(last=False)
+
+    # ----------------------------
+    # Get the statistics of the cache
+    def info(self):
+        with self.lock:
+            return {'hits':self.hits, 'misses':self.misses, 'size':len(self.elements), 'max_size':self.max_size}
+
+    # ----------------
+    # Empty the cache
+    def clear(self):
+        with self.lock:
+            self.elements.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Cache shared by all the selections
+_path_cache = PathCache()
+
+##-\-\-\-\-\-\-\-\-\-\-\
+## DISPLAY CACHE CLASS
+##-/-/-/-/-/-/-/-/-/-/-/
+
+class DisplayCache:
+    def __init__(self):
+
+        # Initialise the content of the cache
+        self.displays = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    # ----------------------------------------------
+    # Get a custom display, compiled only once
+    def get(self, display_name, file_name='display_config.ini'):
+
+        # Forget all the displays of a file when it changes
+        version = getConfigVersion(file_name=file_name)
+
+        with self.lock:
+            if self.versions.get(file_name) != version:
+                self.displays = {x:y for x, y in self.displays.items() if x[0] != file_name}
+                self.versions[file_name] = version
+
+            # Compile the display on the first use
+            key = (file_name, display_name)
+            if key not in self.displays.keys():
+                self.displays[key] = generateCustomDisplay( loadDisplay(display_name, file_name=file_name) )
+
+            return self.displays[key]
+
+# Cache of the custom displays of the files
+_display_cache = DisplayCache()
+
 ##-\-\-\-\-\-\-\-\-\
 ## PRIVATE FUNCTIONS
 ##-/-/-/-/-/-/-/-/-/
@@ -139,94 +302,177 @@ def _splitall(path, use_path=True, separator=''):
 
     return allparts
 
-# -------------------------------------------
-# Select the indices to keep in the selection
-def _select_indices(job_df, path_conditions, column_name='WORK_DIR', use_path=True, separator=''):
+# -----------------------------------------------------
+# Split a path and remove the root folder from the list
+def _path_elements(path, use_path=True, separator=''):
+    return [x for x in _splitall(path, use_path=use_path, separator=separator) if x not in ["/", "\\"]]
 
-    # Get the column to read
-    all_jobs = job_df[column_name]
+# ---------------------------------------------------------------
+# Get the text of the values to split, as squeue printed them
+def _path_texts(all_paths):
+    all_paths = pd.Series(all_paths)
 
-    # Select the indices
-    selected_jobs = []
-    for job_id, job_path in enumerate(all_jobs):
+    # Write the dates and the missing values like in the job list
+    if pd.api.types.is_datetime64_any_dtype(all_paths):
+        all_paths = all_paths.dt.strftime('%Y-%m-%dT%H:%M:%S')
+    all_paths = all_paths.astype(object).where(all_paths.notna(), 'N/A')
 
-        # Split the path in the column
-        path_elements = [x for x in _splitall(job_path, use_path=use_path, separator=separator) if x not in ["/", "\\"]]
+    return [x if isinstance(x, str) else str(x) for x in all_paths]
 
-        # Check if the ID should be kept or not
-        keep_id = True
-        for condition_index, condition_values in path_conditions:
-            if not path_elements[condition_index] in condition_values:
-                keep_id = False
+# ------------------------------------------------------
+# Split a list of new paths at once with the string methods
+def _split_new_paths(all_paths, use_path=True, separator=''):
 
-        # Append the ID if the job can be kept
-        if keep_id:
-            selected_jobs.append(job_id)
+    # Split each path on its own if pandas cannot reproduce the result
+    if (use_path and os.path is not posixpath) or (not use_path and separator == ''):
+        return [tuple( _path_elements(x, use_path=use_path, separator=separator) ) for x in all_paths]
+    all_paths = pd.Series(all_paths, dtype=object)
 
-    return selected_jobs
+    # Split on the separator
+    if not use_path:
+        return [tuple(x for x in elements if x not in ["/", "\\"]) for elements in all_paths.str.split(re.escape(separator))]
 
-# ---------
-# Sort jobs
-def _sort_jobs(job_df, sorting_columns, sorting_names, column_name='WORK_DIR', use_path=True, separator=''):
+    # Set aside the empty paths, the series of slashes and the backslashes
+    is_special = all_paths.isin(['', '/']) | all_paths.str.contains('//', regex=False) | all_paths.str.contains('\\', regex=False)
 
-    # Get the column to read
-    all_jobs = job_df[column_name]
+    # Split the other paths on the slashes, relative paths being read as absolute ones
+    other_paths = all_paths[~is_special]
+    other_paths = other_paths.where(other_paths.str.startswith('/'), '/' + other_paths)
+    other_elements = iter( other_paths.str.split('/') )
 
-    # Select the indices
-    sorted_jobs = {}
-    for job_id, job_path in enumerate(all_jobs):
+    # Add the special paths split one by one
+    return [tuple( _path_elements(x) ) if y else tuple( next(other_elements)[1:] ) for x, y in zip(all_paths, is_special)]
 
-        # Split the path in the column
-        path_elements = [x for x in _splitall(job_path, use_path=use_path, separator=separator) if x not in ["/", "\\"]]
+# ---------------------------------------------------
+# Split all the paths in a table, using the cache
+def _split_unique_paths(all_paths, use_path=True, separator=''):
 
-        # Sort the jobs
-        prev_selection = []
-        for i, (path_id, name) in enumerate(zip(sorting_columns, sorting_names)):
+    # Get the paths already split
+    all_elements, missing_paths = _path_cache.getMany(all_paths, use_path=use_path, separator=separator)
 
-            # Get the current path element name
-            element_name = path_elements[path_id]
+    # Split the new paths and save them
+    if len(missing_paths) != 0:
+        new_elements = _split_new_paths(missing_paths, use_path=use_path, separator=separator)
+        _path_cache.putMany(missing_paths, new_elements, use_path=use_path, separator=separator)
 
-            # Get the current level of the dict
-            current_dict = sorted_jobs
-            if i != 0:
-                for j in range(i):
-                    current_dict = current_dict[prev_selection[j]]
+        # Complete the list
+        new_elements = iter(new_elements)
+        all_elements = [x if x is not None else next(new_elements) for x in all_elements]
 
-            # Initialise dict if required
-            if element_name not in current_dict.keys():
-                current_dict[element_name] = {}
+    return pd.DataFrame(all_elements)
 
-            # Add the name to the previous selection tracking
-            prev_selection.append(element_name)
+# ----------------------------------------------------
+# Split the paths of the jobs in a table of elements
+def _split_paths(all_jobs, use_path=True, separator=''):
 
-        # Convert the last element in an array
-        if len(current_dict[element_name]) == 0:
-            current_dict[element_name] = []
+    # Only split each path once, the missing values being read as N/A
+    path_codes, unique_paths = pd.factorize(all_jobs)
+    unique_texts = _path_texts(unique_paths)
+    if (path_codes == -1).any():
+        path_codes = np.where(path_codes == -1, len(unique_texts), path_codes)
+        unique_texts.append('N/A')
+    element_df = _split_unique_paths(unique_texts, use_path=use_path, separator=separator)
 
-        # Add the job to the element
-        current_dict[element_name].append(job_id)
+    # Get the elements of all the jobs
+    element_df = element_df.reindex(range(len(unique_texts))).take(path_codes).reset_index(drop=True)
 
-    # Convert the list in the last level of the dictionary in dataframes
-    sorted_jobs = _dict_items2list(job_df, sorted_jobs)
+    return element_df
 
-    return sorted_jobs
+# -------------------------------------------
+# Select the indices to keep in the selection
+def _select_indices(job_df, path_conditions, column_name='WORK_DIR', use_path=True, separator=''):
 
-# ---------------------------------------------------------------------------------------
-# Process all the elements of a multi-level dict to convert the last level in a dataframe
-def _dict_items2list(job_df, multi_dict):
+    # Split the paths in the column
+    element_df = _split_paths(job_df[column_name], use_path=use_path, separator=separator)
 
-    # Process all the keys
-    for key in multi_dict.keys():
+    # Check all the conditions at once
+    keep_ids = np.ones(len(element_df), dtype=bool)
+    for condition_index, condition_values in path_conditions:
+        if condition_index in element_df.columns:
+            keep_ids &= element_df[condition_index].isin(set(condition_values)).values
+        else:
+            keep_ids[:] = False
+
+    # Get the IDs of the jobs that can be kept
+    selected_jobs = list( np.flatnonzero(keep_ids) )
+
+    return selected_jobs
+
+# ------------------------------------------------------
+# Write the path conditions as an awk filter for the server
+def _remote_path_filter(path_conditions, column_name='WORK_DIR'):
+
+    # The column must be found in the header
+    if _UNSAFE_CHARACTERS.search(column_name) is not None:
+        return None
+
+    # Only keep the conditions that can be written safely
+    remote_conditions = []
+    for condition_index, condition_values in path_conditions:
+        try:
+            condition_index = int(condition_index)
+        except (TypeError, ValueError):
+            continue
+        condition_values = [str(x) for x in condition_values]
+        if any(x == '' or _UNSAFE_CHARACTERS.search(x) is not None for x in condition_values):
+            continue
+        remote_conditions.append( (condition_index, condition_values) )
+
+    # Nothing to filter on the server
+    if len(remote_conditions) == 0:
+        return None
+
+    # Store the values of each condition
+    value_sets = []
+    for i, (condition_index, condition_values) in enumerate(remote_conditions):
+        value_sets += ['c'+str(i)+'["'+x+'"] = 1' for x in condition_values]
+
+    # Check each condition on the elements of the path
+    tests = ['('+str(condition_index)+' in s) && (s['+str(condition_index)+'] in c'+str(i)+')' for i, (condition_index, _) in enumerate(remote_conditions)]
+
+    # Keep the header and the paths that would not be split the same way on the server
+    awk_script = [
+    'BEGIN { ' + '; '.join(value_sets) + ' }',
+    'NR == 1 { for (i = 1; i <= NF; i++) { h = $i; gsub(/ /, "", h); if (h == "' + column_name + '") k = i } print; next }',
+    r'k == 0 || $k ~ /\\|\/\// { print; next }',
+    '{ p = $k; gsub(/^ +| +$/, "", p); n = split(p, e, "/"); m = 0; split("", s); for (i = 1; i <= n; i++) if (e[i] != "") s[m++] = e[i] }',
+    ' && '.join(tests)
+    ]
+
+    return "awk -F'|' '" + '\n'.join(awk_script) + "'"
+
+# ---------
+# Sort jobs
+def _sort_jobs(job_df, sorting_columns, sorting_names, column_name='WORK_DIR', use_path=True, separator=''):
 
-        # Convert the level if it is a list
-        if isinstance(multi_dict[key], list):
-            multi_dict[key] = job_df.iloc[multi_dict[key]]
+    # Split the paths in the column
+    element_df = _split_paths(job_df[column_name], use_path=use_path, separator=separator)
 
-        # Otherwise, process the next level
+    # Get the path element of each sorting level, N/A for the paths that are too short
+    sorting_keys = []
+    for path_id in sorting_columns:
+        if path_id in element_df.columns:
+            sorting_keys.append( element_df[path_id].fillna('N/A').values )
         else:
-            multi_dict[key] = _dict_items2list(job_df, multi_dict[key])
+            sorting_keys.append( np.full(len(job_df), 'N/A', dtype=object) )
 
-    return multi_dict
+    # Group the jobs on all the levels at once
+    sorted_jobs = {}
+    for group_names, group_df in job_df.groupby(sorting_keys, sort=True):
+
+        # Get the names of all the levels
+        if not isinstance(group_names, tuple):
+            group_names = (group_names,)
+
+        # Get the last level of the dict
+        current_dict = sorted_jobs
+        for element_name in group_names[:-1]:
+            current_dict = current_dict.setdefault(element_name, {})
+
+        # Add the jobs to the element
+        current_dict[group_names[-1]] = group_df
+
+    return sorted_jobs
 
 # ------------------------------------------------------------
 # Convert the settings all-string input in a set of dictionary
@@ -272,19 +518,34 @@ def _setting2custom(settings_dict):
 
 # --------------------------------------------
 # Split the input path into a list of elements
-def splitPath(selection):
+def splitPath(selection, use_path=True, separator=''):
 
     """ Decompose a path into the list of all elements.
     Argument(s):
-        - selection { str } - Path to decompose.
+        - selection { str } - Path to decompose. Numbers and dates are read as the text printed by squeue.
+        - use_path { bool } - (Opt.) Split the path on the folders.
+                              Default is True.
+        - separator { str } - (Opt.) Separator used to split the text when use_path is False.
+                              Default is "".
     Output(s):
-        - element_list { list of str } - List of all the elements composing the input path.
+        - element_list { list of str } - List of all the elements composing the input path, without the root folder.
     """
 
-    element_list = _splitall(selection)
+    element_list = list( _split_unique_paths(_path_texts([selection]), use_path=use_path, separator=separator).iloc[0].dropna() )
 
     return element_list
 
+# ---------------------------------------------
+# Get the statistics of the path splitting cache
+def getPathCacheInfo():
+
+    """ Get the efficiency of the cache used to split the paths.
+    Output(s):
+        - cache_info { dict } - Number of hits and misses of the cache, with its current and maximum sizes.
+    """
+
+    return _path_cache.info()
+
 # ----------------------------------------
 # Create the custom column selection class
 def makeCustomColumns(column_names, name='Custom'):
@@ -323,6 +584,21 @@ def generateCustomDisplay(display_dict):
 
     return display_instance
 
+# --------------------------------------------
+# Get a custom display from the file, compiled
+def loadCustomDisplay(display_name, file_name='display_config.ini'):
+
+    """ Get the instance of the CustomDisplay class of a display saved in the file. The instance is only generated again when the file changes.
+    Argument(s):
+        - display_name { str } - Name of the display to load from the config file.
+        - file_name { str } - (Opt.) Name of the config file to load.
+                              Default is display_config.ini.
+    Output(s):
+        - display_instance { CustomDisplay class } - Instance of the CustomDisplay class of the display.
+    """
+
+    return _display_cache.get(display_name, file_name=file_name)
+
 # ---------------------------
 # Create the selection to use
 def makeSelection(selection, column_name='WORK_DIR', display_name='default', return_selection=True, use_path=True, separator=''):
@@ -1,6 +1,24 @@
 from appdirs import AppDirs
 import configparser
+from contextlib import contextmanager
+import errno
 import os
+import tempfile
+import threading
+import time
+
+# Content of the config files already read, with the state of the files
+_config_cache = {}
+_config_lock = threading.Lock()
+
+# Number of times each config file has been read after a change
+_config_versions = {}
+
+# Edits of the config files waiting for the end of the transaction, for each thread
+_transactions = threading.local()
+
+# Age in seconds of a lock file left by a writer that crashed
+_LOCK_STALE_TIME = 60
 
 ##-\-\-\-\-\-\-\-\-\
 ## PRIVATE FUNCTIONS
@@ -56,36 +74,186 @@ def _init_default_config(file_path, add_default_user=True):
         'autostart':True,
         'autorefresh':True,
         'refresh_time':30,
+        'cache_time':10,
+        'password_time':300,
         'get_jobs':'squeue -o %all -u',
         'kill_jobs':'scancel',
         'kill_col': 'JOBID'
         }
 
+    # The file is already locked by the transaction of this thread
+    if _get_transaction(file_path) is not None:
+        _save_config(config, file_path)
+        return 0
+
+    # Save the file, unless another writer created it meanwhile
+    lock_path = _lock_file(file_path)
+    try:
+        if not os.path.exists(file_path):
+            _save_config(config, file_path)
+    finally:
+        _unlock_file(lock_path)
+
+# -----------------------------------------------------
+# Save the config in a new file that replaces the old one
+def _save_config(config, file_path):
+
     # Check if the folders exist
     if not os.path.exists(os.path.dirname(file_path)):
         _init_folder(file_path)
 
-    # Save the file
-    with open(file_path, 'w') as configfile:
-        config.write(configfile)
+    # Write the whole content in a temporary file first
+    file_id, temp_path = tempfile.mkstemp(prefix='.'+os.path.basename(file_path)+'.', suffix='.tmp', dir=os.path.dirname(file_path))
+    try:
+        with os.fdopen(file_id, 'w') as configfile:
+            config.write(configfile)
+            configfile.flush()
+            os.fsync(configfile.fileno())
 
-# --------------------
-# Open the config file
-def _open_config_file(file_name='config.ini', add_default_user=True):
+        # Replace the file in one step
+        os.replace(temp_path, file_path)
+
+    # Do not leave the temporary file behind
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# ----------------------------------------------------
+# Lock the config file against the other writers
+def _lock_file(file_path, timeout=10, stale_time=_LOCK_STALE_TIME):
+
+    # Check if the folders exist
+    if not os.path.exists(os.path.dirname(file_path)):
+        _init_folder(file_path)
+
+    lock_path = file_path + '.lock'
+    start_time = time.time()
+    while True:
+
+        # Create the lock file, only if it does not exist yet
+        try:
+            lock_id = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(lock_id, str(os.getpid()).encode())
+            os.close(lock_id)
+            return lock_path
+
+        except FileExistsError:
+            pass
+
+        # Remove the lock left by a writer that crashed
+        try:
+            if time.time() - os.path.getmtime(lock_path) > stale_time:
+                os.remove(lock_path)
+                continue
+        except OSError:
+            continue
+
+        # Wait for the other writer
+        if time.time() - start_time > timeout:
+            raise TimeoutError("The file "+file_path+" is locked by another writer.")
+        time.sleep(0.05)
+
+# -------------------------------------------------------
+# Keep the lock file recent while the transaction is open
+def _keep_lock(lock_path, stop_event, refresh_time=_LOCK_STALE_TIME/4):
+    while not stop_event.wait(refresh_time):
+        try:
+            os.utime(lock_path)
+        except OSError:
+            pass
+
+# ------------------------
+# Unlock the config file
+def _unlock_file(lock_path):
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+
+# -------------------------------------------------------
+# Get the transaction opened on the file in this thread
+def _get_transaction(file_path):
+    return getattr(_transactions, 'files', {}).get(file_path)
+
+# ------------------------------------------
+# Get the modification time and size of a file
+def _get_file_state(file_path):
+    file_stat = os.stat(file_path)
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+# --------------------------------------------
+# Read the content of the config file in memory
+def _read_config_file(file_name='config.ini', add_default_user=True):
 
     # Get the path to the config file
     file_path = _return_config_path(file_name=file_name)
 
+    # Read the edits not saved yet
+    transaction = _get_transaction(file_path)
+    if transaction is not None and transaction['config'] is not None:
+        return _config2dict(transaction['config'])
+
     # Initialise the config file if it does not exist
     if not os.path.exists(file_path):
         _init_default_config(file_path=file_path, add_default_user=add_default_user)
 
+    with _config_lock:
+
+        # Only parse the file again if it changed
+        file_state = _get_file_state(file_path)
+        if file_path not in _config_cache.keys() or _config_cache[file_path][0] != file_state:
+
+            # Load the content of the file
+            config = configparser.RawConfigParser()
+            config.read(file_path)
+            _config_cache[file_path] = (file_state, _config2dict(config))
+            _config_versions[file_path] = _config_versions.get(file_path, 0) + 1
+
+        # Return a copy to keep the memory safe from edits
+        conf_dict = {section:dict(values) for section, values in _config_cache[file_path][1].items()}
+
+    return conf_dict
+
+# --------------------
+# Open the config file
+def _open_config_file(file_name='config.ini', add_default_user=True):
+
+    # Keep editing the content not saved yet
+    transaction = _get_transaction(_return_config_path(file_name=file_name))
+    if transaction is not None and transaction['config'] is not None:
+        return transaction['config']
+
     # Load the content of the file
     config = configparser.RawConfigParser()
-    config.read(file_path)
+    config.read_dict( _read_config_file(file_name=file_name, add_default_user=add_default_user) )
 
     return config
 
+# -------------------------------------
+# Save the content of the config file
+def _write_config_file(config, file_name='config.ini'):
+
+    # Get the path to the config file
+    file_path = _return_config_path(file_name=file_name)
+
+    # Wait for the end of the transaction to save the file
+    transaction = _get_transaction(file_path)
+    if transaction is not None:
+        transaction['config'] = config
+        return 0
+
+    # Save the file
+    lock_path = _lock_file(file_path)
+    try:
+        _save_config(config, file_path)
+    finally:
+        _unlock_file(lock_path)
+
+    # Read the file again on the next call
+    with _config_lock:
+        _config_cache.pop(file_path, None)
+
 # ------------------------------------------
 # Convert a config content into a dictionary
 def _config2dict(configs):
@@ -137,40 +305,27 @@ def _add_server(server, config, file_name='config.ini'):
     'query_name':server.queryname,
     'get_jobs':server.get_jobs,
     'kill_jobs':server.kill_jobs,
-    'kill_col': server.kill_col
+    'kill_col': server.kill_col,
+    'compression': server.compression
     }
 
-    # Get the path to the config file
-    file_path = _return_config_path(file_name=file_name)
-
     # Save the file
-    with open(file_path, 'w') as configfile:
-        config.write(configfile)
+    _write_config_file(config, file_name=file_name)
 
 # -------------------------------------
 # Replace the user settings in the file
 def _replace_settings(settings, config, file_name='config.ini'):
 
-    # Replace
-    config['USER'] = {
-    'username':settings['username'],
-    'use_key':settings['use_key'],
-    'path_key':settings['path_key'],
-    'dark_theme':settings['dark_theme'],
-    'autostart':settings['autostart'],
-    'autorefresh':settings['autorefresh'],
-    'refresh_time':settings['refresh_time'],
-    'get_jobs':settings['get_jobs'],
-    'kill_jobs':settings['kill_jobs'],
-    'kill_col': 'JOBID'
-    }
+    # Keep the settings that are not edited
+    user_settings = dict(config['USER']) if config.has_section('USER') else {}
 
-    # Get the path to the config file
-    file_path = _return_config_path(file_name=file_name)
+    # Replace the edited settings
+    user_settings.update(settings)
+    user_settings['kill_col'] = 'JOBID'
+    config['USER'] = user_settings
 
     # Save the file
-    with open(file_path, 'w') as configfile:
-        config.write(configfile)
+    _write_config_file(config, file_name=file_name)
 
 # --------------------------------------------
 # Check if the server is already in the config
@@ -217,12 +372,59 @@ def _add_display(display, config, file_name='display_config.ini'):
         if 'selection_column' in display.display_type:
             config[display.name]['subdisplay_name'] = display.subdisplay_name
 
+    # Save the file
+    _write_config_file(config, file_name=file_name)
+
+##-\-\-\-\-\-\-\-\-\-\-\
+## TRANSACTION FUNCTIONS
+##-/-/-/-/-/-/-/-/-/-/-/
+
+# ------------------------------------------
+# Group the edits of a config file together
+@contextmanager
+def configTransaction(file_name='config.ini'):
+
+    """ Lock the config file and save all the edits made in the block at once, when the block ends.
+    If an error is raised in the block, none of the edits are saved.
+    Argument(s):
+        - file_name { str } - (Opt.) Name of the config file to edit.
+                              Default is config.ini.
+    """
+
     # Get the path to the config file
     file_path = _return_config_path(file_name=file_name)
 
-    # Save the file
-    with open(file_path, 'w') as configfile:
-        config.write(configfile)
+    # Join the transaction already opened on the file
+    if _get_transaction(file_path) is not None:
+        yield
+        return
+
+    # Lock the file for the whole transaction, without letting the lock become stale
+    lock_path = _lock_file(file_path)
+    stop_event = threading.Event()
+    threading.Thread(target=_keep_lock, args=(lock_path, stop_event), daemon=True).start()
+    if not hasattr(_transactions, 'files'):
+        _transactions.files = {}
+    _transactions.files[file_path] = {'config':None}
+
+    try:
+        yield
+
+        # Save all the edits at once
+        config = _transactions.files[file_path]['config']
+        if config is not None:
+            _save_config(config, file_path)
+
+    finally:
+
+        # Close the transaction
+        del _transactions.files[file_path]
+        stop_event.set()
+        _unlock_file(lock_path)
+
+        # Read the file again on the next call
+        with _config_lock:
+            _config_cache.pop(file_path, None)
 
 ##-\-\-\-\-\-\-\-\
 ## SERVER FUNCTIONS
@@ -254,11 +456,8 @@ def loadConfig(file_name='config.ini'):
                               Default is config.ini.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
-
-    # Convert the content into a dict
-    conf_dict = _config2dict(config)
+    # Get the content as a dict
+    conf_dict = _read_config_file(file_name=file_name)
 
     # UPDATE -------------------
     # --------------------------
@@ -268,11 +467,32 @@ def loadConfig(file_name='config.ini'):
         conf_dict['USER']['autostart'] = 'False'
         conf_dict['USER']['autorefresh'] = 'False'
         conf_dict['USER']['refresh_time'] = '30'
+    if 'cache_time' not in conf_dict['USER'].keys():
+        conf_dict['USER']['cache_time'] = '10'
+    if 'password_time' not in conf_dict['USER'].keys():
+        conf_dict['USER']['password_time'] = '300'
 
     # --------------------------
 
     return conf_dict
 
+# -------------------------------------------
+# Get the version of the configuration file
+def getConfigVersion(file_name='config.ini'):
+
+    """ Get the version of the content of the configuration file, which changes every time the file is edited.
+    Argument(s):
+        - file_name { str } - (Opt.) Name of the config file to check.
+                              Default is config.ini.
+    Output(s):
+        - version { int } - Version of the content of the file.
+    """
+
+    # Read the file again if it changed
+    _read_config_file(file_name=file_name)
+
+    return _config_versions.get(_return_config_path(file_name=file_name), 0)
+
 # -----------------------------------------
 # Edit the user settings in the config file
 def editUser(settings, file_name='config.ini'):
@@ -284,11 +504,13 @@ def editUser(settings, file_name='config.ini'):
                               Default is config.ini.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
+    # Save all the edits at once, with the file locked
+    with configTransaction(file_name=file_name):
+        # Get the content
+        config = _open_config_file(file_name=file_name)
 
-    # Replace the settings in the file
-    _replace_settings(settings, config, file_name=file_name)
+        # Replace the settings in the file
+        _replace_settings(settings, config, file_name=file_name)
 
 # -------------------------------
 # Add a server to the config file
@@ -303,15 +525,17 @@ def addServer(server, file_name='config.ini', replace=True):
                              Default is True.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
+    # Save all the edits at once, with the file locked
+    with configTransaction(file_name=file_name):
+        # Get the content
+        config = _open_config_file(file_name=file_name)
 
-    # Check if the server is already in the config
-    in_file, prev_name = _is_server_in_file(server.ip, config)
+        # Check if the server is already in the config
+        in_file, prev_name = _is_server_in_file(server.ip, config)
 
-    # Add only if the conditions are met
-    if not in_file or replace:
-        _add_server(server, config, file_name=file_name)
+        # Add only if the conditions are met
+        if not in_file or replace:
+            _add_server(server, config, file_name=file_name)
 
 # --------------------------------------------
 # Check if the server is already in the config
@@ -374,6 +598,8 @@ def loadServer(server_identification, use_name=False, file_name='config.ini'):
     if 'use_display' not in opened_server.keys():
         opened_server['use_display'] = False
         opened_server['display_name'] = '---'
+    if 'compression' not in opened_server.keys():
+        opened_server['compression'] = 'none'
 
     # --------------------------
 
@@ -390,23 +616,21 @@ def removeServer(server_ip, file_name='config.ini'):
                               Default is config.ini.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
-
-    # Check if the server is already in the config
-    in_file, prev_name = _is_server_in_file(server_ip, config)
+    # Save all the edits at once, with the file locked
+    with configTransaction(file_name=file_name):
+        # Get the content
+        config = _open_config_file(file_name=file_name)
 
-    if in_file:
+        # Check if the server is already in the config
+        in_file, prev_name = _is_server_in_file(server_ip, config)
 
-        # Remove the server if it exists
-        config.remove_section(server_ip)
+        if in_file:
 
-        # Get the path to the config file
-        file_path = _return_config_path(file_name=file_name)
+            # Remove the server if it exists
+            config.remove_section(server_ip)
 
-        # Save the file
-        with open(file_path, 'w') as configfile:
-            config.write(configfile)
+            # Save the file
+            _write_config_file(config, file_name=file_name)
 
 ##-\-\-\-\-\-\-\-\-\-\-\-\
 ## CUSTOM DISPLAY FUNCTIONS
@@ -425,15 +649,17 @@ def addDisplay(display, file_name='display_config.ini', replace=True):
                              Default is True.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name, add_default_user=False)
+    # Save all the edits at once, with the file locked
+    with configTransaction(file_name=file_name):
+        # Get the content
+        config = _open_config_file(file_name=file_name, add_default_user=False)
 
-    # Check if the server is already in the config
-    in_file = _is_display_in_file(display.name, config)
+        # Check if the server is already in the config
+        in_file = _is_display_in_file(display.name, config)
 
-    # Add only if the conditions are met
-    if not in_file or replace:
-        _add_display(display, config, file_name=file_name)
+        # Add only if the conditions are met
+        if not in_file or replace:
+            _add_display(display, config, file_name=file_name)
 
 # ---------------------------------------------
 # Check if the display is already in the config
@@ -470,11 +696,8 @@ def getDisplayList(file_name='display_config.ini', column_only=False):
         - display_list { list of str } - List of the custom displays.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
-
-    # Convert in a directory
-    display_dict = _config2dict(config)
+    # Get the content as a dict
+    display_dict = _read_config_file(file_name=file_name)
 
     # Get the display list
     display_list = [x for x in list(display_dict.keys()) if x != "USER"]
@@ -498,11 +721,8 @@ def getDisplayNameTypeList(file_name='display_config.ini'):
         - display_types { list of str } - List of the custom displays types.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
-
-    # Convert in a directory
-    display_dict = _config2dict(config)
+    # Get the content as a dict
+    display_dict = _read_config_file(file_name=file_name)
 
     # Get the display list
     display_list = [x for x in list(display_dict.keys()) if x != "USER"]
@@ -547,18 +767,16 @@ def removeDisplay(display_name, file_name='display_config.ini'):
                               Default is display_config.ini.
     """
 
-    # Get the content
-    config = _open_config_file(file_name=file_name)
-
-    # Check if the display is already in the config
-    if _is_display_in_file(display_name, config):
+    # Save all the edits at once, with the file locked
+    with configTransaction(file_name=file_name):
+        # Get the content
+        config = _open_config_file(file_name=file_name)
 
-        # Remove the server if it exists
-        config.remove_section(display_name)
+        # Check if the display is already in the config
+        if _is_display_in_file(display_name, config):
 
-        # Get the path to the config file
-        file_path = _return_config_path(file_name=file_name)
+            # Remove the server if it exists
+            config.remove_section(display_name)
 
-        # Save the file
-        with open(file_path, 'w') as configfile:
-            config.write(configfile)
+            # Save the file
+            _write_config_file(config, file_name=file_name)
@@ -1,8 +1,16 @@
+import codecs
 import keyring
 from paramiko import SSHClient, AutoAddPolicy
-from sshtunnel import SSHTunnelForwarder
+from paramiko.ssh_exception import SSHException
+import os
+import select
+import socket
+import threading
+import time
+import uuid
+import zlib
 
-from settings import loadServer
+from settings import getConfigVersion, loadServer
 
 ##-\-\-\-\-\-\
 ## SERVER CLASS
@@ -10,7 +18,7 @@ from settings import loadServer
 
 # Define the server class
 class Server:
-    def __init__(self, name, ip_address, username, identification={'type':'publickey', 'key':'~/.ssh/id_rsa'}, port=22, tunnel=None, read=True, commands={'get_jobs':'squeue -o %all -u', 'kill_jobs':'scancel'}, queryname=None, kill_col='JOBID', display={'use_display':True, 'display_name':'---'}):
+    def __init__(self, name, ip_address, username, identification={'type':'publickey', 'key':'~/.ssh/id_rsa'}, port=22, tunnel=None, read=True, commands={'get_jobs':'squeue -o %all -u', 'kill_jobs':'scancel'}, queryname=None, kill_col='JOBID', display={'use_display':True, 'display_name':'---'}, compression='none'):
 
         # Get the server info
         self.name = name
@@ -20,9 +28,8 @@ class Server:
 
         # Get the authentification info
         self.username = username
-        if identification['type'] == 'publickey':
-            self.identification = identification
-        else:
+        self.identification = identification
+        if identification['type'] != 'publickey':
             self.getPassword(identification['key'])
 
         # Get the tunnel if required
@@ -43,6 +50,9 @@ class Server:
         self.use_display = display['use_display']
         self.display_name = display['display_name']
 
+        # Get the compression of the outputs (none, ssh or gzip)
+        self.compression = compression
+
     ##-\-\-\-\-\-\-\-\-\-\
     ## ACCESS INFORMATIONS
     ##-/-/-/-/-/-/-/-/-/-/
@@ -52,10 +62,11 @@ class Server:
     def setPassword(self, key):
 
         # Prepare the keyring identification
-        keyring_id = self.name + '_' + self.ip + '_' + self.username
+        keyring_id = self.keyringID()
 
         # Get the password from input
         keyring.set_password('hpymon',keyring_id,key)
+        _password_cache.store(keyring_id, key)
 
         # Prepare the ID infos
         self.identification = {
@@ -67,25 +78,365 @@ class Server:
     # Get the password
     def getPassword(self, key):
 
-        # Get the password from input
-        password = keyring.get_password('hpymon',key)
-
-        # Check if the password exists
-        if password is None:
+        # Save the password typed by the user
+        if key != 'crypted':
             self.setPassword(key)
-            return None
-
-        # Return the password
+            return key
+
+        # Get the password from the keyring
+        return _password_cache.get( self.keyringID() )
+
+    # -----------------------------------------
+    # Get the name of the password in the keyring
+    def keyringID(self):
+        return self.name + '_' + self.ip + '_' + self.username
+
+##-\-\-\-\-\-\-\-\-\-\-\
+## PASSWORD CACHE CLASS
+##-/-/-/-/-/-/-/-/-/-/-/
+
+# Define the passwords read from the keyring
+class PasswordCache:
+    def __init__(self, lifetime=300):
+
+        # Get the settings of the cache
+        self.lifetime = lifetime
+
+        # Initialise the cache content
+        self.passwords = {}
+        self.lock = threading.Lock()
+
+    # ------------------------------------------------
+    # Get a password, from the keyring only if needed
+    def get(self, keyring_id):
+
+        # Use the password read recently
+        with self.lock:
+            if keyring_id in self.passwords.keys():
+                password, read_time = self.passwords[keyring_id]
+                if time.time() - read_time < self.lifetime:
+                    return password
+
+        # Read the password from the keyring otherwise
+        password = keyring.get_password('hpymon',keyring_id)
+        if password is not None:
+            self.store(keyring_id, password)
+
+        return password
+
+    # -------------------------------
+    # Keep a password in the cache
+    def store(self, keyring_id, password):
+        with self.lock:
+            self.passwords[keyring_id] = (password, time.time())
+
+    # ------------------------------
+    # Forget one or all passwords
+    def invalidate(self, keyring_id=None):
+        with self.lock:
+            if keyring_id is None:
+                self.passwords = {}
+            else:
+                self.passwords.pop(keyring_id, None)
+
+# Initialise the cache shared by all the servers
+_password_cache = PasswordCache()
+
+##-\-\-\-\-\-\-\-\-\-\-\
+## CONNECTION POOL CLASS
+##-/-/-/-/-/-/-/-/-/-/-/
+
+# Define a connection stored in the pool
+class PooledConnection:
+    def __init__(self, key, client, parent=None):
+
+        # Get the connection info
+        self.key = key
+        self.client = client
+        self.parent = parent
+
+        # Get the usage info
+        self.users = 0
+        self.reused = False
+        self.last_used = time.time()
+
+    # ---------------------------------------
+    # Check if the transport is still running
+    def isAlive(self):
+
+        # Get the transport of the client
+        transport = self.client.get_transport()
+
+        return transport is not None and transport.is_active()
+
+    # --------------------
+    # Close the connection
+    def close(self):
+        self.client.close()
+
+# Define the pool of authenticated connections
+class ConnectionPool:
+    def __init__(self, keepalive=30, idle_timeout=600, max_per_host=2):
+
+        # Get the settings of the pool
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.max_per_host = max_per_host
+
+        # Initialise the pool content
+        self.connections = {}
+        self.pending = {}
+        self.condition = threading.Condition()
+
+    ##-\-\-\-\-\-\-\-\-\-\-\
+    ## MANAGE THE CONNECTIONS
+    ##-/-/-/-/-/-/-/-/-/-/-/
+
+    # ---------------------------------------
+    # Get a connection to the server to use
+    def acquire(self, key, connect_function):
+
+        with self.condition:
+            while True:
+
+                # Clean the content of the pool
+                self._evict_idle()
+                host_connections = self.connections.setdefault(key, [])
+                self._remove_dead(host_connections)
+
+                # Use a connection nobody is using
+                for connection in host_connections:
+                    if connection.users == 0:
+                        return self._checkout(connection)
+
+                # Reserve the spot of a new connection if possible
+                n_connections = len(host_connections) + self.pending.get(key, 0)
+                if n_connections < self.max_per_host:
+                    self.pending[key] = self.pending.get(key, 0) + 1
+                    break
+
+                # Share the least used connection otherwise
+                if len(host_connections) > 0:
+                    connection = min(host_connections, key=lambda x: x.users)
+                    return self._checkout(connection)
+
+                # Wait for the pending connections to be opened
+                self.condition.wait()
+
+        # Open the new connection outside of the lock
+        try:
+            client, parent = connect_function()
+            client.get_transport().set_keepalive(self.keepalive)
+
+        # Release the spot if the connection failed
+        except:
+            with self.condition:
+                self.pending[key] -= 1
+                self.condition.notify_all()
+            raise
+
+        # Add the new connection to the pool
+        with self.condition:
+            self.pending[key] -= 1
+            connection = PooledConnection(key, client, parent=parent)
+            connection.users = 1
+            self.connections.setdefault(key, []).append(connection)
+            self.condition.notify_all()
+
+        return connection
+
+    # --------------------------------------
+    # Give back the connection after its use
+    def release(self, connection, broken=False):
+
+        with self.condition:
+
+            # Update the usage info
+            connection.users -= 1
+            connection.last_used = time.time()
+
+            # Keep the previous hops of the tunnel alive as well
+            previous_hop = connection.parent
+            while previous_hop is not None:
+                previous_hop.last_used = connection.last_used
+                previous_hop = previous_hop.parent
+
+            # Remove the connection if it cannot be used again
+            if broken or not connection.isAlive():
+                self._discard(connection)
+
+            self.condition.notify_all()
+
+    # ---------------------------------
+    # Close all the connections of pool
+    def closeAll(self):
+
+        with self.condition:
+            for host_connections in self.connections.values():
+                for connection in host_connections:
+                    connection.close()
+            self.connections = {}
+
+    ##-\-\-\-\-\-\-\-\-\
+    ## PRIVATE FUNCTIONS
+    ##-/-/-/-/-/-/-/-/-/
+
+    # -----------------------------------
+    # Mark the connection as being in use
+    def _checkout(self, connection):
+        connection.users += 1
+        connection.reused = True
+        return connection
+
+    # -----------------------------------
+    # Remove a connection from the pool
+    def _discard(self, connection):
+
+        # Close the connection
+        connection.close()
+
+        # Remove it from the list
+        host_connections = self.connections.get(connection.key, [])
+        if connection in host_connections:
+            host_connections.remove(connection)
+
+    # -------------------------------------------
+    # Remove the connections with a dead transport
+    def _remove_dead(self, host_connections):
+        for connection in list(host_connections):
+            if not connection.isAlive():
+                self._discard(connection)
+
+    # --------------------------------------------
+    # Close the connections not used for some time
+    def _evict_idle(self):
+
+        # Get the time limit
+        time_limit = time.time() - self.idle_timeout
+
+        # Close all the idle connections
+        for host_connections in self.connections.values():
+            for connection in list(host_connections):
+                if connection.users == 0 and connection.last_used < time_limit:
+                    self._discard(connection)
+
+# Initialise the pool shared by all the servers
+_connection_pool = ConnectionPool()
+
+# Servers already generated from the config file, with the version of the file they come from
+_server_registry = {'version':None, 'servers':{}}
+_registry_lock = threading.RLock()
+
+# Longest wait in seconds between two checks of the output, the errors and the exit status of a channel
+_POLL_INTERVAL = 0.1
+
+##-\-\-\-\-\-\-\-\-\-\-\
+## FRAME SPLITTER CLASS
+##-/-/-/-/-/-/-/-/-/-/-/
+
+# Define the splitter of the output of several commands, received by pieces
+class FrameSplitter:
+    def __init__(self, marker, n_commands, parser=None):
+
+        # Get the settings of the splitter
+        self.separator = '\n' + marker + ' '
+        self.n_commands = n_commands
+        self.parser = parser
+
+        # Initialise the content of the frames
+        self.buffer = ''
+        self.in_header = False
+        self.current = None
+        self.contents = [None] * n_commands
+        self.all_output = [''] * n_commands
+        self.all_status = [None] * n_commands
+
+    # --------------------------------------
+    # Add the next piece of the output
+    def feed(self, text):
+        self.buffer += text
+
+        while True:
+
+            # Read the header of the frame once its line is complete
+            if self.in_header:
+                end = self.buffer.find('\n')
+                if end == -1:
+                    return
+                self._start_frame(self.buffer[:end])
+                self.buffer = self.buffer[end+1:]
+                self.in_header = False
+                continue
+
+            # Give the content to the current frame, but keep what could be the start of a separator
+            position = self.buffer.find(self.separator)
+            if position == -1:
+                keep = min(len(self.buffer), len(self.separator) - 1)
+                self._write(self.buffer[:len(self.buffer)-keep])
+                self.buffer = self.buffer[len(self.buffer)-keep:]
+                return
+            self._write(self.buffer[:position])
+            self.buffer = self.buffer[position+len(self.separator):]
+            self.in_header = True
+
+    # ------------------------------------------------------
+    # Get the output and the exit status of each command
+    def close(self):
+        if not self.in_header:
+            self._write(self.buffer)
+        self.buffer = ''
+
+        # Keep the output of the commands which did not send their status
+        for i, content in enumerate(self.contents):
+            if content is not None and self.parser is None:
+                self.all_output[i] = ''.join(content)
+        self.contents = [None] * self.n_commands
+
+        return self.all_output, self.all_status
+
+    # ---------------------------------------------
+    # Open or close a frame from its header
+    def _start_frame(self, header):
+        self.current = None
+
+        # Ignore the headers which are not from the commands (e.g. END)
+        frame_id, is_status, status = header.partition(' STATUS ')
+        if not frame_id.isdigit() or int(frame_id) >= self.n_commands:
+            return
+        frame_id = int(frame_id)
+
+        # Start the content of the command
+        if is_status == '':
+            self.current = frame_id
+            self.contents[frame_id] = [] if self.parser is None else self.parser()
+
+        # Finish the command, and parse its output if it succeeded
+        elif status.isdigit():
+            self.all_status[frame_id] = int(status)
+            content = self.contents[frame_id]
+            self.contents[frame_id] = None
+            if self.parser is None:
+                self.all_output[frame_id] = '' if content is None else ''.join(content)
+            elif self.all_status[frame_id] == 0 and content is not None:
+                self.all_output[frame_id] = content.close()
+
+    # ---------------------------------
+    # Add text to the current frame
+    def _write(self, text):
+        if self.current is None or len(text) == 0:
+            return
+        if self.parser is None:
+            self.contents[self.current].append(text)
         else:
-            return password
+            self.contents[self.current].feed(text)
 
 ##-\-\-\-\-\-\-\-\-\
 ## PRIVATE FUNCTIONS
 ##-/-/-/-/-/-/-/-/-/
 
-# -----------------------------------------
-# Connect to a server and execute a command
-def _connect_and_execute(ip, port, username, identification, *commands, output=True):
+# -------------------------------
+# Open a new client to the server
+def _open_client(ip, port, username, identification, sock=None, timeout=None, compress=False):
 
     # Get the ID details
     id_type = identification['type']
@@ -101,118 +452,230 @@ def _connect_and_execute(ip, port, username, identification, *commands, output=T
     if id_type == 'publickey':
         client.set_missing_host_key_policy(AutoAddPolicy())
 
+        # Use the key file if it can be found
+        key_filename = None
+        if os.path.isfile( os.path.expanduser(id_key) ):
+            key_filename = os.path.expanduser(id_key)
+
         # Connect the to server
-        client.connect(ip, port, username=username)
+        client.connect(ip, port, username=username, key_filename=key_filename, sock=sock, timeout=timeout, banner_timeout=timeout, auth_timeout=timeout, compress=compress)
 
     # Connect with a password
     else:
-        client.connect(ip, username=username, port=port, password=id_key)
+        client.connect(ip, username=username, port=port, password=id_key, sock=sock, timeout=timeout, banner_timeout=timeout, auth_timeout=timeout, compress=compress)
 
-    # Prepare the commands
-    if not isinstance(output, list):
-        output = [output] * len(commands)
+    return client
 
-    # Send all the commands
-    all_output = []
-    for i, cmd in enumerate(commands):
+# ------------------------------------------------
+# Join the commands in a single script with frames
+def _frame_commands(commands, use_gzip=False):
 
-        # Execute the command
-        stdin, stdout, stderr = client.exec_command(cmd)
+    # Use a marker that cannot be in the output of the commands
+    marker = '#HPYMON-' + uuid.uuid4().hex
 
-        # Store the output
-        if output[i]:
-            all_output.append(stdout.read().decode("utf8"))
-        stdout.close()
+    # Print a frame header before each command, on the output and on the errors
+    script = []
+    for i, cmd in enumerate(commands):
+        header = "printf '\\n%s\\n' '" + marker + ' ' + str(i) + "'"
+        script.append( header + '\n' + header + ' >&2' )
+
+        # Print the exit status of the command in a frame after it, even if it exits the shell
+        script.append( "( " + cmd + "\n)\nprintf '\\n%s %s\\n' '" + marker + ' ' + str(i) + " STATUS' \"$?\"" )
+    script.append( "printf '\\n%s\\n' '" + marker + " END'" )
+
+    # Compress the output of each part of the script
+    if use_gzip:
+        script = [_gzip_command(line) for line in script]
+
+    return '\n'.join(script), marker
+
+# ---------------------------------------------
+# Compress the output of the command on the server
+def _gzip_command(command):
+    return '( ' + command + ' ) | gzip -c'
+
+# ---------------------------------------------------------
+# Receive the output of a command by chunks, as it arrives
+def _iter_output(channel, use_gzip=False, chunk_size=65536, errors=None):
+
+    # Decompress all the gzip members sent by the server
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    # Stop waiting after the timeout of the channel without any new data
+    timeout = channel.gettimeout()
+    last_time = time.time()
+
+    while True:
+
+        # Read the errors, so that the command never waits for them to be read
+        if _read_errors(channel, chunk_size=chunk_size, errors=errors):
+            last_time = time.time()
+
+        # Wait a short time for the output, and check the errors again
+        if not channel.recv_ready() and not channel.eof_received and not channel.exit_status_ready():
+            if timeout is not None and time.time() - last_time > timeout:
+                raise socket.timeout()
+            select.select([channel], [], [], _POLL_INTERVAL if timeout is None else min(_POLL_INTERVAL, timeout))
+            continue
+
+        # Read the next chunk of the output
+        chunk = channel.recv(chunk_size)
+        if len(chunk) == 0:
+            _read_errors(channel, chunk_size=chunk_size, errors=errors)
+            break
+        last_time = time.time()
+
+        # Decompress the chunk
+        if use_gzip:
+            data = decompressor.decompress(chunk)
+            while decompressor.eof and len(decompressor.unused_data) != 0:
+                unused_data = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                data += decompressor.decompress(unused_data)
+            chunk = data
+
+        yield chunk
+
+# ----------------------------------------------------------
+# Read the errors received so far, and keep them if needed
+def _read_errors(channel, chunk_size=65536, errors=None):
+    received = False
+    while channel.recv_stderr_ready():
+        chunk = channel.recv_stderr(chunk_size)
+        received = True
+        if errors is not None:
+            errors.append(chunk)
+
+    return received
+
+# ------------------------------------------------------
+# Read the output of a command, and parse it on the fly
+def _read_output(stdout, use_gzip=False, parser=None, errors=None):
+
+    # Decode the text without cutting the characters between chunks
+    decoder = codecs.getincrementaldecoder('utf8')()
+
+    # Give each piece of text to the parser as soon as it arrives
+    all_text = []
+    for chunk in _iter_output(stdout.channel, use_gzip=use_gzip, errors=errors):
+        text = decoder.decode(chunk)
+        if parser is None:
+            all_text.append(text)
+        else:
+            parser.feed(text)
 
-    # Return the result
-    if len(all_output) == 0:
-        all_output = None
+    # Return the whole text if there is no parser
+    text = decoder.decode(b'', final=True)
+    if parser is None:
+        all_text.append(text)
+        return ''.join(all_text)
 
-    # Close the client
-    client.close()
+    # Get the result of the parser otherwise
+    parser.feed(text)
+    return parser.close()
 
-    return all_output
+# -----------------------------------------------
+# Execute all the commands in a single channel
+def _execute_batch(client, *commands, timeout=None, use_gzip=False, parser=None):
 
-# ----------------
-# Do the tunneling
-def _tunneling(tunnel_list, *commands, output=True, tunnel_id=0):
+    # Prepare the script
+    script, marker = _frame_commands(commands, use_gzip=use_gzip)
 
-    # Get the first server on the list
-    crt_tunnel = tunnel_list[0]
-    next_tunnel = tunnel_list[1]
+    # Execute the script
+    stdin, stdout, stderr = client.exec_command(script, timeout=timeout)
 
-    # Get the ID details
-    id_type = crt_tunnel.identification['type']
-    id_key = crt_tunnel.identification['key']
+    # Split and parse the output of each command as it arrives
+    splitter = FrameSplitter(marker, len(commands), parser=parser)
+    errors = []
+    try:
+        all_output, all_status = _read_output(stdout, use_gzip=use_gzip, parser=splitter, errors=errors)
+
+    # Close the channel even if the script timed out
+    finally:
+        stdout.channel.close()
+
+    # Split the errors of the commands
+    error_splitter = FrameSplitter(marker, len(commands))
+    error_splitter.feed(b''.join(errors).decode('utf8', errors='replace'))
+    all_errors, _ = error_splitter.close()
+
+    # Replace the output of the commands that failed by their error
+    for i, status in enumerate(all_status):
+        if status != 0:
+            if status is None:
+                message = "No exit status received for the command: "+commands[i]
+            else:
+                message = "The command failed with the exit status "+str(status)+": "+commands[i]
+            if all_errors[i].strip() != '':
+                message += "\n" + all_errors[i].strip()
+            all_output[i] = RuntimeError(message)
 
-    # Define the information on the next step
-    next_ip = '0.0.0.'+str(tunnel_id)
+    return all_output
 
-    # Start the tunnel with public key
-    if id_type == 'publickey':
-        with SSHTunnelForwarder (
-            (crt_tunnel.ip, crt_tunnel.port),
+# ---------------------------------
+# Execute the commands on a client
+def _execute(client, *commands, output=True, timeout=None, batch=False, use_gzip=False, parser=None):
 
-            # Connection info
-            ssh_username=crt_tunnel.username,
-            ssh_pkey=id_key,
+    # Run all the commands at once if possible
+    if batch and output is True:
+        return _execute_batch(client, *commands, timeout=timeout, use_gzip=use_gzip, parser=parser)
 
-            # Next step info
-            remote_bind_address=(next_tunnel.ip, next_tunnel.port),
-            local_bind_address=(next_ip, 10022)
-        ) as tunnel:
+    # Prepare the commands
+    if not isinstance(output, list):
+        output = [output] * len(commands)
 
-            # Move to the next tunnel if needed
-            if len(tunnel_list) > 2:
-                outputs = _tunneling(tunnel_list[1:], *commands, output=output, tunnel_id=tunnel_id+1)
+    # Send all the commands
+    all_output = []
+    for i, cmd in enumerate(commands):
 
-            else:
-                outputs = _connect_and_execute(next_ip, 10022, next_tunnel.username, next_tunnel.identification, *commands, output=output)
+        # Compress the output to read
+        if output[i] and use_gzip:
+            cmd = _gzip_command(cmd)
 
-    # Start the tunnel with password
-    else:
-        with SSHTunnelForwarder (
-            (crt_tunnel.ip, crt_tunnel.port),
+        # Execute the command
+        stdin, stdout, stderr = client.exec_command(cmd, timeout=timeout)
 
-            # Connection info
-            ssh_username=crt_tunnel.username,
-            ssh_password=id_key,
+        # Store the output
+        try:
+            if output[i]:
+                all_output.append( _read_output(stdout, use_gzip=use_gzip, parser=None if parser is None else parser()) )
 
-            # Next step info
-            remote_bind_address=(next_tunnel.ip, next_tunnel.port),
-            local_bind_address=(next_ip, 10022)
-        ) as tunnel:
+        # Close the channel even if the command timed out
+        finally:
+            stdout.channel.close()
 
-            # Move to the next tunnel if needed
-            if len(tunnel_list) > 2:
-                outputs = _tunneling(tunnel_list[1:], *commands, output=output, tunnel_id=tunnel_id+1)
+    # Return the result
+    if len(all_output) == 0:
+        all_output = None
 
-            else:
+    return all_output
 
-                # Connect with a public key
-                if next_tunnel.identification['type'] == 'publickey':
-                    identification = next_tunnel.identification
+# ------------------------------------------
+# Get the identification to send to the server
+def _get_identification(server_class):
 
-                # Connect with a password
-                else:
-                    identification = {
-                    'type': next_tunnel.identification['type'],
-                    'key': next_tunnel.getPassword( next_tunnel.identification['key'] )
-                    }
+    # Connect with a public key
+    if server_class.identification['type'] == 'publickey':
+        identification = server_class.identification
 
-                outputs = _connect_and_execute(next_ip, 10022, next_tunnel.username, identification, *commands, output=output)
+    # Connect with a password
+    else:
+        identification = {
+        'type': server_class.identification['type'],
+        'key': server_class.getPassword( server_class.identification['key'] )
+        }
 
-    return outputs
+    return identification
 
-# ----------------------
-# Use a tunnel if needed
-def _get_tunnel_chain(server_class, *commands, output=True):
+# ----------------------------------------
+# List all the servers to reach the server
+def _get_tunnel_chain(server_class):
 
     # Get the informations on the tunnel
     crt_tunnel = server_class
     tunnel_servers = [crt_tunnel]
 
-    # Check the chain
+    # Check the chain
     read_tunnels = True
     while read_tunnels:
 
@@ -225,10 +688,104 @@ def _get_tunnel_chain(server_class, *commands, output=True):
         else:
             read_tunnels = False
 
-    # Start the tunneling
-    outputs = _tunneling(tunnel_servers[::-1], *commands, output=output)
+    return tunnel_servers[::-1]
 
-    return outputs
+# ------------------------------------------------
+# Get the key of the last connection of the chain
+def _get_connection_key(tunnel_list):
+
+    # Chain the keys of all the hops
+    key = None
+    for crt_tunnel in tunnel_list:
+        key = (crt_tunnel.ip, int(crt_tunnel.port), crt_tunnel.username, crt_tunnel.identification['type'], crt_tunnel.identification['key'], crt_tunnel.compression == 'ssh', key)
+
+    return key
+
+# -------------------------------------------
+# Open the last connection of the tunnel chain
+def _open_hop(tunnel_list, timeout=None):
+
+    # Get the server to connect to
+    crt_tunnel = tunnel_list[-1]
+    identification = _get_identification(crt_tunnel)
+
+    # Compress the whole transport if required
+    compress = crt_tunnel.compression == 'ssh'
+
+    # Connect directly
+    if len(tunnel_list) == 1:
+        client = _open_client(crt_tunnel.ip, crt_tunnel.port, crt_tunnel.username, identification, timeout=timeout, compress=compress)
+        return client, None
+
+    # Forward a channel through the previous hop
+    while True:
+        previous_hop = _acquire_connection(tunnel_list[:-1], timeout=timeout)
+
+        try:
+            channel = previous_hop.client.get_transport().open_channel('direct-tcpip', (crt_tunnel.ip, int(crt_tunnel.port)), ('127.0.0.1', 0), timeout=timeout)
+
+        # Rebuild the previous hop if it died in the meantime
+        except (SSHException, EOFError, socket.error):
+            _connection_pool.release(previous_hop, broken=True)
+            if previous_hop.reused:
+                continue
+            raise
+
+        _connection_pool.release(previous_hop)
+        break
+
+    # Connect through the channel
+    try:
+        client = _open_client(crt_tunnel.ip, crt_tunnel.port, crt_tunnel.username, identification, sock=channel, timeout=timeout, compress=compress)
+    except:
+        channel.close()
+        raise
+
+    return client, previous_hop
+
+# -------------------------------------------------------
+# Get a connection to the last server of the tunnel chain
+def _acquire_connection(tunnel_list, timeout=None):
+
+    # Get the key of the connection in the pool
+    key = _get_connection_key(tunnel_list)
+
+    return _connection_pool.acquire(key, lambda: _open_hop(tunnel_list, timeout=timeout))
+
+# -----------------------------------------
+# Connect to a server and execute a command
+def _connect_and_execute(server_class, *commands, output=True, timeout=None, batch=False, parser=None):
+
+    # Get the servers to go through
+    tunnel_list = _get_tunnel_chain(server_class)
+
+    # Retry once if a connection from the pool died in the meantime
+    while True:
+        connection = _acquire_connection(tunnel_list, timeout=timeout)
+
+        try:
+            all_output = _execute(connection.client, *commands, output=output, timeout=timeout, batch=batch, use_gzip=server_class.compression == 'gzip', parser=parser)
+
+        # Do not retry a command that is hanging on the server
+        except socket.timeout:
+            _connection_pool.release(connection)
+            raise
+
+        # Reconnect if the connection was an old one
+        except (SSHException, EOFError, socket.error):
+            _connection_pool.release(connection, broken=True)
+            if connection.reused:
+                continue
+            raise
+
+        # Release the connection otherwise
+        except:
+            _connection_pool.release(connection)
+            raise
+
+        _connection_pool.release(connection)
+
+        return all_output
 
 # --------------------------
 # Format the dictionary from
@@ -250,7 +807,8 @@ def _format_dictionary(server_dict):
     'queryname': server_dict['query_name'],
     'get_jobs': server_dict['get_jobs'],
     'kill_jobs': server_dict['kill_jobs'],
-    'kill_col': server_dict['kill_col']
+    'kill_col': server_dict['kill_col'],
+    'compression': server_dict['compression']
     }
 
     # Add the tunnel
@@ -282,6 +840,8 @@ def generateServer(server_details):
     if 'use_display' not in server_details.keys():
         server_details['use_display'] = False
         server_details['display_name'] = '---'
+    if 'compression' not in server_details.keys():
+        server_details['compression'] = 'none'
 
     # --------------------------
 
@@ -323,7 +883,8 @@ def generateServer(server_details):
     commands=job_commands,
     queryname=server_details['queryname'],
     kill_col=server_details['kill_col'],
-    display=display_details
+    display=display_details,
+    compression=server_details['compression']
     )
 
     return new_server_class
@@ -339,22 +900,40 @@ def openServer(server_identification, use_name=True):
                               Default is False.
     Output(s):
         - server_class { Server class } - Instance of the Server class to send the commands to.
+                                          The same instance is returned until the config file is edited.
     """
 
-    # Get the dictionary
-    server_dict = loadServer(server_identification, use_name=use_name)
+    with _registry_lock:
 
-    # Format the dictionary
-    server_details = _format_dictionary(server_dict)
+        # Forget the servers if the settings changed
+        config_version = getConfigVersion()
+        if _server_registry['version'] != config_version:
+            _server_registry['version'] = config_version
+            _server_registry['servers'] = {}
+
+        # Use the server already generated
+        if use_name and server_identification in _server_registry['servers'].keys():
+            return _server_registry['servers'][server_identification]
 
-    # Get the tunnel from the details
-    server_class = generateServer(server_details)
+        # Get the dictionary
+        server_dict = loadServer(server_identification, use_name=use_name)
+        if server_dict['name'] in _server_registry['servers'].keys():
+            return _server_registry['servers'][server_dict['name']]
+
+        # Format the dictionary
+        server_details = _format_dictionary(server_dict)
+
+        # Get the tunnel from the details
+        server_class = generateServer(server_details)
+
+        # Share the server with the next calls
+        _server_registry['servers'][server_class.name] = server_class
 
     return server_class
 
 # --------------------------
 # Send command to the server
-def sendCommands(server_class, *commands, output=True):
+def sendCommands(server_class, *commands, output=True, timeout=None, batch=False, parser=None):
 
     """ Send a list of commands in a server
     Argument(s):
@@ -362,48 +941,85 @@ def sendCommands(server_class, *commands, output=True):
         - commands { multiple str } - Command or list of commands to submit on the server.
         - output { bool } - (Opt.) Return the output from the command line.
                             Default is True.
+        - timeout { float } - (Opt.) Time in seconds after which a connection or a command is considered to hang.
+                              Default is None (no limit).
+        - batch { bool } - (Opt.) Run all the commands in a single remote shell, and split their outputs locally. Only used if output is True.
+                           The output of a command ending with a non-zero exit status is replaced by a RuntimeError with its error message.
+                           Default is False.
+        - parser { class } - (Opt.) Class parsing each output while it is received, with the methods feed(text) and close().
+                             The value returned by close() replaces the text of the output.
+                             Default is None (return the text).
     Output(s):
         - outputs { list of str } - List of all the string obtained when running the commands in input.
                                     If output is set to False, the function returns None.
     """
 
-    # Connect directly
-    if server_class.tunnel is None:
-
-        # Connect with a public key
-        if server_class.identification['type'] == 'publickey':
-            identification = server_class.identification
-
-        # Connect with a password
-        else:
-            identification = {
-            'type': server_class.identification['type'],
-            'key': server_class.getPassword( server_class.identification['key'] )
-            }
+    # Connect to the server, through its tunnels if needed
+    outputs = _connect_and_execute(server_class, *commands, output=output, timeout=timeout, batch=batch, parser=parser)
 
-        outputs = _connect_and_execute(server_class.ip, server_class.port, server_class.username, identification, *commands, output=output)
+    return outputs
 
+# ----------------------------------------------
+# Get the connection used to reach the server
+def connectionKey(server_class):
 
-    # Tunnel through other servers
-    else:
-        outputs = _get_tunnel_chain(server_class, *commands, output=True)
+    """ Get the key of the connection used to send the commands to the server.
+    Argument(s):
+        - server_class { Server class } - Instance of the server class.
+    Output(s):
+        - key { tuple } - Key of the connection in the pool. Servers with the same key share their connections.
+    """
 
-    return outputs
+    return _get_connection_key( _get_tunnel_chain(server_class) )
 
 # --------------------------------
 # Check if the server is connected
-def checkConnection(server_class):
+def checkConnection(server_class, timeout=None):
 
     """ Send a list of commands in a server
     Argument(s):
         - server_class { Server class } - Instance of the server class to send the commands to.
+        - timeout { float } - (Opt.) Time in seconds after which the server is considered to hang.
+                              Default is None (no limit).
     """
 
     # Check the connection
     try:
-        sendCommands(server_class, 'ls', output=True)
+        sendCommands(server_class, 'ls', output=True, timeout=timeout)
         return True
 
     # Return false if failed
     except:
         return False
+
+# --------------------------------------
+# Forget the servers already generated
+def clearServers():
+
+    """ Remove all the servers from the registry, so that the next calls of openServer read the config file again.
+    """
+
+    with _registry_lock:
+        _server_registry['version'] = None
+        _server_registry['servers'] = {}
+
+# ----------------------------------------------
+# Set how long the passwords are kept in memory
+def setPasswordLifetime(lifetime):
+
+    """ Set how long the passwords read from the keyring are kept in memory.
+    Argument(s):
+        - lifetime { float } - Time in seconds before reading a password from the keyring again. Use 0 to always read the keyring.
+    """
+
+    _password_cache.lifetime = lifetime
+    _password_cache.invalidate()
+
+# ----------------------------------------
+# Close all the connections kept in memory
+def closeConnections():
+
+    """ Close all the connections kept open in the connection pool.
+    """
+
+    _connection_pool.closeAll()
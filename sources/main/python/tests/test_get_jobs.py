@@ -0,0 +1,39 @@
+from get_jobs import JobListParser, diffJobLists
+
+# Header of the job lists of the tests
+_HEADER = "JOBID|NAME|STATE|CPUS|START_TIME|WORK_DIR"
+
+# ---------------------------------
+# Parse a job list from its lines
+def _parse(lines):
+    parser = JobListParser()
+    parser.feed('\n'.join([_HEADER] + lines) + '\n')
+    return parser.close()
+
+# ---------------------------------------------------------
+# Pending jobs without a start time are not seen as updated
+def test_diff_ignores_missing_dates():
+    lines = ["1|a|RUNNING|4|2024-01-01T10:00:00|/home/u/a", "2|b|PENDING|4|N/A|/home/u/b", "3_1|c|PENDING|N/A|N/A|/home/u/c"]
+    old_df = _parse(lines)
+    new_df = _parse(lines[:2] + ["3_1|c|RUNNING|N/A|2024-01-01T11:00:00|/home/u/c", "4|d|PENDING|1|N/A|/home/u/d"])
+
+    assert old_df['START_TIME'].isna().sum() == 2
+    assert diffJobLists(old_df, _parse(lines)) == ([], [], [])
+    assert diffJobLists(old_df, new_df) == (['4'], [], ['3_1'])
+
+# -------------------------------------------------------
+# A value that becomes missing is seen as an update
+def test_diff_detects_missing_values():
+    old_df = _parse(["1|a|RUNNING|4|2024-01-01T10:00:00|/home/u/a"])
+    new_df = _parse(["1|a|RUNNING|N/A|N/A|/home/u/a"])
+
+    assert diffJobLists(old_df, new_df) == ([], [], ['1'])
+
+# ---------------------------------------------------------
+# An empty job list has the same types as a full one
+def test_empty_list_keeps_types():
+    empty_df = _parse([])
+    full_df = _parse(["1|a|RUNNING|4|2024-01-01T10:00:00|/home/u/a"])
+
+    assert len(empty_df) == 0
+    assert empty_df.dtypes.equals(full_df.dtypes)
@@ -0,0 +1,33 @@
+import os
+
+from get_jobs import JobListParser
+from job_history import HistoryStore, _make_delta
+
+# Lines of the job list of the tests, with pending jobs without a start time
+_LINES = ["JOBID|STATE|START_TIME", "1|RUNNING|2024-01-01T10:00:00", "2|PENDING|N/A", "3|PENDING|N/A"]
+
+# ---------------------------------
+# Parse a job list from its lines
+def _parse(lines):
+    parser = JobListParser()
+    parser.feed('\n'.join(lines) + '\n')
+    return parser.close()
+
+# ----------------------------------------------------
+# Two identical job lists with missing dates give no change
+def test_identical_snapshots_give_empty_delta(tmp_path):
+    assert len(_make_delta(_parse(_LINES), _parse(_LINES))) == 0
+
+    # Nothing is written for the second job list
+    store = HistoryStore(str(tmp_path))
+    assert store.append(_parse(_LINES), timestamp=1.7e9) == 3
+    assert store.append(_parse(_LINES), timestamp=1.7e9 + 60) == 0
+    assert sum(len(files) for _, _, files in os.walk(str(tmp_path))) == 1
+
+# ----------------------------------------------
+# Only the jobs that changed are saved in a delta
+def test_delta_keeps_changed_jobs():
+    new_lines = _LINES[:2] + ["2|RUNNING|2024-01-01T11:00:00", "3|PENDING|N/A"]
+    delta_df = _make_delta(_parse(_LINES), _parse(new_lines))
+
+    assert list(delta_df['JOBID']) == ['2']
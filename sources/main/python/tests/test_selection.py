@@ -0,0 +1,28 @@
+import pandas as pd
+
+from selection import getSelection, getSorted, splitPath
+
+# ------------------------------------------------------
+# Numbers and dates are split as squeue printed them
+def test_split_typed_values():
+    assert splitPath(12) == ['12']
+    assert splitPath(pd.Timestamp('2024-01-01T10:00:00'), use_path=False, separator='T') == ['2024-01-01', '10:00:00']
+
+# ---------------------------------------------------
+# The jobs can be selected on an integer or a date column
+def test_select_typed_columns():
+    job_df = pd.DataFrame({'CPUS':pd.array([4, 16, None], dtype='Int64'), 'START_TIME':pd.to_datetime(['2024-01-01T10:00:00', None, '2024-01-02T10:00:00'])})
+
+    assert list( getSelection(job_df, {0:('CPUS', ['16'], 0)}, column_name='CPUS').index ) == [1]
+    assert list( getSelection(job_df, {0:('Day', ['2024-01-02'], 0)}, column_name='START_TIME', use_path=False, separator='T').index ) == [2]
+
+# ---------------------------------------------------------
+# The paths too short for a sorting level are kept under N/A
+def test_sort_short_paths():
+    job_df = pd.DataFrame({'WORK_DIR':['/a/b/c', '/a/b', '/a/x/y']})
+    sorted_jobs = getSorted(job_df, {1:('Level 1', None, 0), 2:('Level 2', None, 1)})
+
+    assert sorted(sorted_jobs.keys()) == ['b', 'x']
+    assert sorted(sorted_jobs['b'].keys()) == ['N/A', 'c']
+    assert list( sorted_jobs['b']['N/A']['WORK_DIR'] ) == ['/a/b']
+    assert sum(len(y) for x in sorted_jobs.values() for y in x.values()) == 3
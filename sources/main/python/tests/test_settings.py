@@ -0,0 +1,29 @@
+import os
+
+import settings
+
+# -----------------------------------------------------
+# Use a temporary folder for the config files of a test
+def _use_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, '_return_default_folder', lambda: str(tmp_path))
+    settings._config_cache.clear()
+
+# ------------------------------------------------
+# The edited user settings are all saved in the file
+def test_edit_user_keeps_all_settings(monkeypatch, tmp_path):
+    _use_folder(monkeypatch, tmp_path)
+
+    # Edit some of the settings, including the time to reuse the job lists
+    user_settings = settings.loadConfig()['USER']
+    user_settings['cache_time'] = '42'
+    user_settings['refresh_time'] = '5'
+    settings.editUser(user_settings)
+
+    # Keep a setting only found in the file
+    settings.editUser({'username':'other'})
+
+    config = settings.loadConfig()
+    assert config['USER']['cache_time'] == '42'
+    assert config['USER']['refresh_time'] == '5'
+    assert config['USER']['username'] == 'other'
+    assert os.path.exists(os.path.join(str(tmp_path), 'config.ini'))